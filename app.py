@@ -1,6 +1,7 @@
 from flask import Flask
 from flask_socketio import SocketIO, emit
 from threading import Thread, Event
+import multiprocessing
 
 
 from services.driver_manage_service import DriverManager
@@ -34,6 +35,7 @@ def create_app():
     blueprints.download.download_routes.register_socketio_handlers(socketio)
     blueprints.log_parser.log_parser_routes.register_socketio_handlers(socketio)
     blueprints.automation.automation_routes.register_socketio_handlers(socketio)
+    blueprints.llm.llm_routes.register_socketio_handlers(socketio)
 
     print("📋 Registered routes:")
     for rule in app.url_map.iter_rules():
@@ -43,6 +45,8 @@ def create_app():
 
 
 if __name__ == "__main__":
+    # log parser filters huge logs in a process pool; needed for the PyInstaller exe
+    multiprocessing.freeze_support()
     app, socketio = create_app()
     set_up(socketio)
     app_config.set_driver_manager(DriverManager(app_config.avatarfiles_dir))
@@ -1,9 +1,14 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash, Response, jsonify
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, Response, jsonify, send_file
+import os
 import json
+import time
 import traceback
 
 from services.llm_service import LLM_helper
 from configs.global_configs import app_config
+from utils.socket_stream import SocketTokenStream
+from services.batch_classify_service import BatchClassifyService, batch_jobs
+from utils import helpers
 
 llm_bp = Blueprint("llm", __name__, url_prefix="/llm")
 
@@ -18,15 +23,23 @@ def get_llm_analysis():
             }
     try:
         llm_helper: LLM_helper = app_config.llm_helper
-        if llm_helper != None:
+        refresh = request.args.get('refresh') == '1'
+        # result of a stream_desc_analysis that already ran for this case
+        streamed = None if refresh else app_config.pop_desc_analysis(session["case_context"]['case_nbr'])
+        if streamed is not None:
+            ai_analysis = streamed
+        elif llm_helper != None:
             ai_analysis = llm_helper.analyze_desc(
                 prompt_path = session['prompt_file_path'],
-                case_context = session["case_context"]
+                case_context = session["case_context"],
+                use_cache = not refresh
             )
-            if type(ai_analysis) == dict:
-                session['classification'] = ai_analysis["Classification"]
         else:
             ai_analysis = "LLM helper currently not available"
+
+        # streamed and direct results both carry the classification used by auto analysis
+        if type(ai_analysis) == dict and "Classification" in ai_analysis:
+            session['classification'] = ai_analysis["Classification"]
         
         response_data = {
             'success': True,
@@ -44,5 +57,130 @@ def get_llm_analysis():
             'success': False,
             'error': str(e)
         }), 500
-    
 
+
+def register_socketio_handlers(socketio):
+    @socketio.on('stream_desc_analysis', namespace='/progress')
+    def socketio_stream_desc_analysis(data=None):
+        """
+        Runs analyze_desc with the completion streamed to the caller as
+        'desc_stream' deltas, then 'desc_analysis_completed'. Socket handlers
+        cannot write the flask session, so the result is parked in app_config
+        and the page collects it (and the classification) from /llm/get_llm_analysis.
+        """
+        llm_helper: LLM_helper = app_config.llm_helper
+        sid = request.sid
+        if llm_helper is None:
+            socketio.emit('desc_analysis_completed', {'success': False, 'error': 'LLM helper currently not available'},
+                          namespace='/progress', to=sid)
+            return
+        case_context = session["case_context"]
+        prompt_path = session['prompt_file_path']
+        use_cache = not (data or {}).get('refresh')
+        socketio.start_background_task(stream_desc_analysis, socketio, llm_helper, sid,
+                                       case_context, prompt_path, use_cache)
+
+
+def stream_desc_analysis(socketio, llm_helper: LLM_helper, sid, case_context, prompt_path, use_cache):
+    token_stream = SocketTokenStream(socketio, 'desc_stream', to=sid)
+    try:
+        ai_analysis = llm_helper.analyze_desc(
+            prompt_path = prompt_path,
+            case_context = case_context,
+            use_cache = use_cache,
+            on_token = token_stream
+        )
+        token_stream.flush()
+        app_config.set_desc_analysis(case_context['case_nbr'], ai_analysis)
+        socketio.emit('desc_analysis_completed', {'success': True}, namespace='/progress', to=sid)
+    except Exception as e:
+        print(f"❌ Streamed LLM analysis failed:\n{traceback.format_exc()}")
+        socketio.emit('desc_analysis_completed', {'success': False, 'error': str(e)}, namespace='/progress', to=sid)
+
+
+@llm_bp.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    llm_helper: LLM_helper = app_config.llm_helper
+    if llm_helper is None or llm_helper.response_cache is None:
+        return jsonify({'success': False, 'error': 'LLM cache not available'})
+    return jsonify({'success': True, 'stats': llm_helper.response_cache.stats()})
+
+
+@llm_bp.route('/gateway_stats', methods=['GET'])
+def gateway_stats():
+    llm_helper: LLM_helper = app_config.llm_helper
+    if llm_helper is None or llm_helper.gateway is None:
+        return jsonify({'success': False, 'error': 'LLM gateway not available'})
+    return jsonify({'success': True, 'stats': llm_helper.gateway.stats()})
+
+
+@llm_bp.route('/telemetry', methods=['GET'])
+def telemetry():
+    """ ?hours=24 (0 = all), ?caller=analyze_log, ?recent=20 adds the latest raw rows """
+    llm_helper: LLM_helper = app_config.llm_helper
+    if llm_helper is None or llm_helper.telemetry is None:
+        return jsonify({'success': False, 'error': 'LLM telemetry not available'})
+    try:
+        hours = float(request.args.get('hours', 24))
+        recent = int(request.args.get('recent', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'hours and recent must be numbers'}), 400
+    since = time.time() - hours * 3600 if hours > 0 else None
+    response_data = {
+        'success': True,
+        'summary': llm_helper.telemetry.summary(since, request.args.get('caller')),
+    }
+    if recent > 0:
+        response_data['recent'] = llm_helper.telemetry.recent(recent)
+    if llm_helper.gateway is not None:
+        response_data['gateway'] = llm_helper.gateway.stats()
+    return jsonify(response_data)
+
+
+@llm_bp.route('/batch_classify', methods=['POST'])
+def batch_classify():
+    """
+    {"case_nbrs": [...] or "one per line", "format": "jsonl" | "csv"} -> background job,
+    progress on 'batch_classify_progress' (/progress) and GET /llm/batch_classify/<job_id>
+    """
+    llm_helper: LLM_helper = app_config.llm_helper
+    if llm_helper is None or llm_helper.gateway is None:
+        return jsonify({'success': False, 'error': 'LLM helper currently not available'}), 503
+
+    data = request.get_json(silent=True) or {}
+    case_nbrs = data.get('case_nbrs') or []
+    if isinstance(case_nbrs, list):
+        case_nbrs = " ".join(str(case_nbr) for case_nbr in case_nbrs)
+    case_nbrs, rejected = helpers.parse_case_numbers(case_nbrs)
+    fmt = data.get('format', 'jsonl')
+    if not case_nbrs:
+        return jsonify({'success': False, 'error': 'case_nbrs is required (8-digit case numbers)',
+                        'rejected': rejected}), 400
+    if fmt not in ('jsonl', 'csv'):
+        return jsonify({'success': False, 'error': 'format must be jsonl or csv'}), 400
+
+    output_dir = os.path.join(app_config.avatarfiles_dir, "batch_classify")
+    service = BatchClassifyService(llm_helper, app_config.get_key().snowflake_passwd)
+
+    def on_progress(job_id, job):
+        if app_config.socketio is not None:
+            app_config.socketio.emit('batch_classify_progress', job, namespace='/progress')
+
+    job = batch_jobs.start(service, case_nbrs, output_dir, fmt, on_progress)
+    return jsonify({'success': True, 'job': job, 'rejected': rejected})
+
+
+@llm_bp.route('/batch_classify/<job_id>', methods=['GET'])
+def batch_classify_status(job_id):
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@llm_bp.route('/batch_classify/<job_id>/download', methods=['GET'])
+def batch_classify_download(job_id):
+    job = batch_jobs.get(job_id)
+    if job is None or not os.path.exists(job['output_path']):
+        return jsonify({'success': False, 'error': 'Unknown job or no output yet'}), 404
+    return send_file(job['output_path'], as_attachment=True, download_name=os.path.basename(job['output_path']))
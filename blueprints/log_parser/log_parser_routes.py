@@ -117,7 +117,11 @@ def handle_submit_analysis(data):
         
         success = log_parser_service.start_analysis(
             filter_path, log_path, session['logparser_output_dir'], 
-            app_config.llm_helper, custom_prompt_content
+            app_config.llm_helper, custom_prompt_content,
+            parallel=data.get('parallel'),
+            chunked=data.get('chunked'),
+            stream=bool(data.get('stream')),
+            extra_prompts=log_parser_service.load_extra_prompts(data.get('extra_prompts'))
         )
         
         if not success:
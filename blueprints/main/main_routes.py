@@ -1,10 +1,11 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify
 import os
 import subprocess
 
 from utils import helpers
 from utils.etl_utils import get_auto_analysis_etl
 from services.case_info_service import CaseService
+from services.case_prefetch_service import case_prefetcher
 from models.models import CaseContext
 from configs.global_configs import app_config
 
@@ -37,6 +38,21 @@ def download_result():
 def download_result_bsod():
     return render_download_result_bsod_form()
 
+@main_bp.route('/prefetch', methods=['GET', 'POST'])
+def prefetch():
+    if request.method == 'POST':
+        return handle_prefetch_submission()
+    return jsonify({'success': True, **case_prefetcher.status()})
+
+@main_bp.route('/prefetch/clipboard', methods=['POST'])
+def prefetch_clipboard():
+    data = request.get_json(silent=True) or {}
+    if data.get('enable', True):
+        case_prefetcher.start_clipboard_watch(analyze=data.get('analyze', True))
+    else:
+        case_prefetcher.stop_clipboard_watch()
+    return jsonify({'success': True, **case_prefetcher.status()})
+
 
 #------------INDEX render/submission -------------#
 
@@ -55,6 +71,8 @@ def handle_case_submission():
     
     case_context = CaseContext(case_nbr=case_nbr)
     try:
+        # let a running prefetch of this case finish instead of downloading it twice
+        case_prefetcher.wait(case_nbr)
         case_context = CaseService.process_case(case_context=case_context)
         if case_context.error_message:
             flash("Invalid case number or unable to retrieve data. Please try again.", "danger")
@@ -76,6 +94,26 @@ def handle_case_submission():
         return redirect(url_for('main.index'))
     
 
+#------------PREFETCH submission -------------#
+
+def handle_prefetch_submission():
+    """ case numbers from JSON {"case_nbrs": [...] or "text", "analyze": bool} or an uploaded text file """
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8', errors='ignore')
+        analyze = request.form.get('analyze', '1') != '0'
+    else:
+        data = request.get_json(silent=True) or {}
+        text = data.get('case_nbrs') or ''
+        if isinstance(text, list):
+            text = " ".join(str(case_nbr) for case_nbr in text)
+        analyze = data.get('analyze', True)
+
+    case_nbrs, rejected = helpers.parse_case_numbers(text)
+    if not case_nbrs:
+        return jsonify({'success': False, 'error': 'No case numbers provided', 'rejected': rejected}), 400
+    return jsonify({'success': True, **case_prefetcher.enqueue(case_nbrs, analyze), 'rejected': rejected})
+
+
 #------------SELLECT ATTACHMENT render/submission -------------#
 
 def render_select_attachments_form():
@@ -1,6 +1,7 @@
 from typing import Optional, Dict, Any
 from services.driver_manage_service import DriverManager
 from services.llm_service import LLM_helper
+from utils.case_cache import CaseCache
 from flask_socketio import SocketIO
 
 
@@ -13,6 +14,7 @@ class GlobalConfig:
         self.driver_manager: Optional[DriverManager] = None
         self.llm_helper: Optional[LLM_helper] = None
         self.key_module: Optional[Any] = None
+        self.case_cache: Optional[CaseCache] = None
         
         # Directory paths
         self.avatarfiles_dir: Optional[str] = None
@@ -21,6 +23,8 @@ class GlobalConfig:
         self.project_root: Optional[str] = None
         # Download results storage
         self.download_results: Dict[str, Dict[str, Any]] = {}
+        # analyze_desc results streamed over socketio, picked up by /llm/get_llm_analysis
+        self.desc_analysis_results: Dict[str, Any] = {}
     
     # SocketIO management
     def set_socketio(self, socketio: SocketIO) -> None:
@@ -34,6 +38,10 @@ class GlobalConfig:
     def set_llm_helper(self, llm_helper: LLM_helper) -> None:
         self.llm_helper = llm_helper
     
+    # Case cache
+    def set_case_cache(self, case_cache: CaseCache) -> None:
+        self.case_cache = case_cache
+    
     # Key management
     def set_key(self, key: Any) -> None:
         self.key = key
@@ -71,6 +79,13 @@ class GlobalConfig:
         else:
             self.download_results.clear()
     
+    # Streamed description analysis
+    def set_desc_analysis(self, case_nbr: str, result: Any) -> None:
+        self.desc_analysis_results[case_nbr] = result
+    
+    def pop_desc_analysis(self, case_nbr: str) -> Any:
+        return self.desc_analysis_results.pop(case_nbr, None)
+    
     # Utility methods
     def is_initialized(self) -> Dict[str, bool]:
         return {
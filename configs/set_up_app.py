@@ -1,8 +1,12 @@
+import os
 from pathlib import Path
 
 from configs.path_configs import KEY_PATH_prim, KEY_PATH_bkup, CLASSIFY_PATH
 from utils import helpers
 from services.llm_service import LLM_helper
+from utils.llm_cache import LLMResponseCache
+from utils.llm_telemetry import LLMTelemetry
+from utils.case_cache import CaseCache
 
 from configs.global_configs import app_config
 
@@ -24,12 +28,18 @@ def set_up(socketio):
         app_config.set_key(key)
 
     
+    # local copy of Snowflake case rows / comments
+    app_config.set_case_cache(CaseCache(os.path.join(avatarfiles_dir, "case_cache.sqlite")))
+
     # LLM
     llm_helper = LLM_helper()
 
     if key_path != None:
         llm_helper.set_up( key.expertgpt_token, key.expertgpt_url, key.expertgpt_model, CLASSIFY_PATH)
 
+    llm_helper.set_response_cache(LLMResponseCache(os.path.join(avatarfiles_dir, "llm_cache.sqlite")))
+    llm_helper.set_telemetry(LLMTelemetry(os.path.join(avatarfiles_dir, "llm_telemetry.sqlite")))
+
     app_config.set_llm_helper(llm_helper)
 
     # socketio
@@ -0,0 +1,221 @@
+"""
+Batch classification of many IPS cases: fetch each case from Snowflake (a few
+at a time), classify it through LLM_helper in the batch lane, write JSONL/CSV.
+
+    python -m services.batch_classify_service cases.txt -o backlog.jsonl
+    python -m services.batch_classify_service 00123456 00123457 --format csv
+"""
+import os
+import csv
+import json
+import time
+import uuid
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from services.case_info_service import CaseService
+from services.llm_gateway import PRIORITY_BATCH
+from utils.helpers import parse_case_numbers
+
+
+RESULT_FIELDS = ["case_nbr", "subject", "subcategory", "issue_type", "confidence", "keywords_found",
+                 "source", "error", "elapsed_sec"]
+
+
+class BatchClassifyService:
+    # Snowflake lookups and LLM calls in flight per batch
+    FETCH_WORKERS = 4
+    CLASSIFY_WORKERS = 8
+
+    def __init__(self, llm_helper, passwd: str, fetch_workers: Optional[int] = None,
+                 classify_workers: Optional[int] = None):
+        self.llm_helper = llm_helper
+        self.passwd = passwd
+        self.fetch_workers = fetch_workers or self.FETCH_WORKERS
+        self.classify_workers = classify_workers or self.CLASSIFY_WORKERS
+
+    def _classify(self, case_context, started: float) -> Dict[str, Any]:
+        result = {
+            "case_nbr": case_context.case_nbr,
+            "subject": case_context.subject,
+            "subcategory": case_context.subcategory,
+            "error": case_context.error_message,
+        }
+        if not case_context.error_message:
+            classification = self.llm_helper.classify_issue(case_context.to_dict(), priority=PRIORITY_BATCH)
+            result.update({
+                "issue_type": classification.get("issue_type"),
+                "confidence": classification.get("confidence"),
+                "keywords_found": classification.get("keywords_found", []),
+                "source": classification.get("source", "llm"),
+                # classify_issue answers Unclassified on an LLM failure; keep it apart from a real Unclassified
+                "error": classification.get("error"),
+            })
+        result["elapsed_sec"] = round(time.time() - started, 2)
+        return result
+
+    def iter_classify(self, case_nbrs: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """ results in completion order; a case that fails yields a row with `error` set """
+        started = {}
+        with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="batch_fetch") as fetch_pool, \
+             ThreadPoolExecutor(max_workers=self.classify_workers, thread_name_prefix="batch_classify") as classify_pool:
+            pending = {}
+            for case_nbr in case_nbrs:
+                started[case_nbr] = time.time()
+                pending[fetch_pool.submit(CaseService.fetch_case_context, case_nbr, self.passwd)] = ("fetch", case_nbr)
+
+            # each case is classified as soon as its fetch completes
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, case_nbr = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield {"case_nbr": case_nbr, "error": f"{stage} failed: {e}",
+                               "elapsed_sec": round(time.time() - started[case_nbr], 2)}
+                        continue
+                    if stage == "fetch":
+                        pending[classify_pool.submit(self._classify, result, started[case_nbr])] = ("classify", case_nbr)
+                    else:
+                        yield result
+
+    def classify_to_file(self, case_nbrs: List[str], output_path: str, fmt: str = "jsonl",
+                         progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """ write one row per case to output_path as they finish; returns counts per issue type """
+        if fmt not in ("jsonl", "csv"):
+            raise ValueError(f"Output format not supported: {fmt} (current support: jsonl, csv)")
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+        summary = {"total": len(case_nbrs), "done": 0, "errors": 0, "issue_types": {}}
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore") if fmt == "csv" else None
+            if writer:
+                writer.writeheader()
+            for result in self.iter_classify(case_nbrs):
+                if writer:
+                    writer.writerow({**result, "keywords_found": ";".join(result.get("keywords_found") or [])})
+                else:
+                    f.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+
+                summary["done"] += 1
+                if result.get("error"):
+                    summary["errors"] += 1
+                else:
+                    issue_type = result.get("issue_type") or "Unclassified"
+                    summary["issue_types"][issue_type] = summary["issue_types"].get(issue_type, 0) + 1
+                if progress_callback:
+                    progress_callback(summary["done"], summary["total"], result)
+        return summary
+
+
+class BatchClassifyJobs:
+    """ background batch runs for the /llm/batch_classify endpoint """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def start(self, service: BatchClassifyService, case_nbrs: List[str], output_dir: str, fmt: str = "jsonl",
+              on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex[:12]
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        job = {
+            "job_id": job_id,
+            "status": "running",
+            "total": len(case_nbrs),
+            "done": 0,
+            "errors": 0,
+            "output_path": os.path.join(output_dir, f"batch_classify_{timestamp}_{job_id}.{fmt}"),
+            "started": time.time(),
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+
+        def progress(done, total, result):
+            with self.lock:
+                job["done"] = done
+                job["errors"] += 1 if result.get("error") else 0
+            if on_progress:
+                on_progress(job_id, dict(job))
+
+        def run():
+            try:
+                summary = service.classify_to_file(case_nbrs, job["output_path"], fmt, progress)
+                with self.lock:
+                    job.update(status="completed", issue_types=summary["issue_types"])
+            except Exception as e:
+                print(f"Batch classification {job_id} failed: {e}")
+                with self.lock:
+                    job.update(status="failed", error=str(e))
+            finally:
+                with self.lock:
+                    job["elapsed_sec"] = round(time.time() - job["started"], 1)
+            if on_progress:
+                on_progress(job_id, self.get(job_id))
+
+        threading.Thread(target=run, daemon=True).start()
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+
+batch_jobs = BatchClassifyJobs()
+
+
+#---------------- CLI ---------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify many IPS cases into JSONL/CSV")
+    parser.add_argument("cases", nargs="+", help="case numbers, or files with one case number per line")
+    parser.add_argument("-o", "--output", help="output file (default: batch_classify_<time>.<format>)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="output format (default: from --output, else jsonl)")
+    parser.add_argument("--fetch-workers", type=int, default=BatchClassifyService.FETCH_WORKERS)
+    parser.add_argument("--classify-workers", type=int, default=BatchClassifyService.CLASSIFY_WORKERS)
+    args = parser.parse_args(argv)
+
+    texts = []
+    for item in args.cases:
+        if os.path.isfile(item):
+            with open(item, "r", encoding="utf-8") as f:
+                texts.append(f.read())
+        else:
+            texts.append(item)
+    case_nbrs, rejected = parse_case_numbers("\n".join(texts))
+    if rejected:
+        print(f"Skipped {len(rejected)} entries that are not case numbers: {rejected[:20]}")
+    if not case_nbrs:
+        raise SystemExit("No case numbers given")
+
+    fmt = args.format or ("csv" if args.output and args.output.lower().endswith(".csv") else "jsonl")
+    output_path = args.output or f"batch_classify_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+    # same key / LLM helper / caches as the app, without the web server
+    from configs.set_up_app import set_up
+    from configs.global_configs import app_config
+    set_up(None)
+    if app_config.llm_helper is None or app_config.llm_helper.gateway is None:
+        raise SystemExit("LLM helper is not available (key file not found?)")
+
+    service = BatchClassifyService(app_config.llm_helper, app_config.get_key().snowflake_passwd,
+                                   args.fetch_workers, args.classify_workers)
+    start = time.time()
+
+    def progress(done, total, result):
+        status = result.get("error") or f"{result.get('issue_type')} ({result.get('confidence')})"
+        print(f"[{done}/{total}] {result.get('case_nbr')}: {status}")
+
+    summary = service.classify_to_file(case_nbrs, output_path, fmt, progress)
+    print(f"Classified {summary['done']} cases ({summary['errors']} errors) in {time.time() - start:.1f}s "
+          f"-> {output_path}")
+    print(json.dumps(summary["issue_types"], indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import os
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash
-from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, has_request_context
 import shutil
 import time
 
@@ -32,10 +31,12 @@ class CaseService:
         print("-----download_path:-----", case_context.case_download_dir)
 
 
-        case_fields = CaseService._get_case_info_from_snowflake(case_context.case_nbr[2:], key.snowflake_passwd)
+        # case fields + comments in one round trip (or from the local case cache)
+        case_data = CaseService._get_case_data(case_context.case_nbr, key.snowflake_passwd)
 
-        if  case_fields is not None:
+        if  case_data is not None:
 
+            case_fields, case_context.comments, case_context.attachment_info, changed = case_data
             (case_context.id, 
             case_context.subject, 
             case_context.env_detail, 
@@ -43,16 +44,19 @@ class CaseService:
             case_context.backend_id, 
             case_context.subcategory) = case_fields
 
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                comment_future = executor.submit(CaseService._get_case_comments_from_snowflake,  case_context.id, key.snowflake_passwd)
-                pdf_future = executor.submit(CaseService._download_pdf_by_url,  case_context.id, case_context.case_download_dir)
-                case_context.comments, case_context.attachment_info = comment_future.result(timeout=100)
-                case_context.ips_pdf_path = pdf_future.result(timeout=100)
+            # the IPS PDF only changes with the case, reuse the last download otherwise
+            cached_pdf_path = os.path.join(case_context.case_download_dir, 'Core_IPS_Case_ExportPDF_LEX.pdf')
+            if not changed and os.path.exists(cached_pdf_path):
+                print("(case cache) case unchanged, reuse downloaded PDF")
+                case_context.ips_pdf_path = cached_pdf_path
+            else:
+                case_context.ips_pdf_path = CaseService._download_pdf_by_url(case_context.id, case_context.case_download_dir)
 
         else: # snowflake failed, try parse from pdf
             case_context.id, case_context.ips_pdf_path  = CaseService._download_pdf_by_simulation(case_context.case_nbr, case_context.case_download_dir)
             if case_context.id == None:
-                session.clear()
+                if has_request_context():  # also run by the background prefetcher
+                    session.clear()
                 case_context.error_message = f"Error downloading PDF"
                 return case_context
             case_context = case_utils.parse_pdf_for_all_info(case_context.ips_pdf_path , case_context)
@@ -63,6 +67,24 @@ class CaseService:
 
         return case_context
     
+    @staticmethod
+    def fetch_case_context(case_nbr: str, passwd: str) -> CaseContext:
+        """ Snowflake-only case fields + comments, no PDF download or session (batch jobs) """
+        case_context = CaseContext(case_nbr=case_nbr)
+        case_data = CaseService._get_case_data(case_nbr, passwd)
+        if case_data is None:
+            case_context.error_message = "Case not found in Snowflake"
+            return case_context
+
+        case_fields, case_context.comments, case_context.attachment_info, _ = case_data
+        (case_context.id, 
+        case_context.subject, 
+        case_context.env_detail, 
+        case_context.description, 
+        case_context.backend_id, 
+        case_context.subcategory) = case_fields
+        case_context.wifi_or_bt = "wifi" if "wifi" in (case_context.subcategory or "").lower() else "bt"
+        return case_context
 
     @staticmethod
     def load_case_summary_prompt(wifi_or_bt):
@@ -82,32 +104,12 @@ class CaseService:
         return target_prompt
     
     @staticmethod
-    def _get_case_info_from_snowflake(case_nbr, passwd):
-        sql_query = f"""
-        SELECT CASE_ID, SUBJECT_TXT, ENV_DETAIL_DSC, ISS_CASE_DESCRIPTION_DSC, 
-               BACKEND_ID, CORE_ISSUE_SUBCATEGORY_EXTERNAL_TXT 
-        FROM SALES_MARKETING.sales_support_premier_analysis.fact_case 
-        WHERE CASE_NBR={case_nbr}
-        """
-        schema = "sales_support_premier_analysis.fact_case"
-        row = snowflake_query(passwd, sql_query, schema, fetch_mode="one")
-        
-        if not row:
-            return None
-            
-        case_id, subject, env_detail, description, backend_id, subcategory = row
-        return case_id, subject, parse_html_table(env_detail), description, backend_id, subcategory
-    
+    def _case_nbr_param(case_nbr):
+        # CASE_NBR used to be compared with an unquoted literal, bind digits as a number
+        return int(case_nbr) if str(case_nbr).isdigit() else case_nbr
+
     @staticmethod
-    def _get_case_comments_from_snowflake(case_id, passwd):
-        sql_query = f"""
-        SELECT CORE_IPS_CREATED_DTM, CORE_IPS_COMMENT_AUTHOR_TYPE_TXT, CORE_IPS_CASE_COMMENT_TXT 
-        FROM SALES_MARKETING.SALES_SUPPORT_PREMIER_ANALYSIS.DIM_CORE_IPS_CASE_COMMENTS 
-        WHERE CORE_IPS_CASE_ID='{case_id}'
-        """
-        schema = "sales_support_premier_analysis.DIM_CORE_IPS_CASE_COMMENTS"
-        comments = snowflake_query(passwd, sql_query, schema, fetch_mode="all")
-        
+    def _process_comments(comments):
         att_info = {}
         processed_comments = []
         
@@ -120,6 +122,87 @@ class CaseService:
             processed_comments.append(comm)
             
         return processed_comments, att_info
+
+    @staticmethod
+    def _get_case_with_comments_from_snowflake(case_nbr, passwd, since=None):
+        """
+        Case row and its comments in one round trip: (case_fields, raw comment rows),
+        or None when the case is not found. The case columns come once in the first
+        row and each comment row only carries the comment columns (UNION ALL, not a
+        join that would repeat the description per comment). Comments come back
+        oldest first, and only those created at or after `since` when it is given.
+        """
+        comment_filter = "AND m.CORE_IPS_CREATED_DTM >= ?" if since is not None else ""
+        sql_query = f"""
+        WITH c AS (
+            SELECT CASE_ID, SUBJECT_TXT, ENV_DETAIL_DSC, ISS_CASE_DESCRIPTION_DSC, 
+                   BACKEND_ID, CORE_ISSUE_SUBCATEGORY_EXTERNAL_TXT 
+            FROM SALES_MARKETING.sales_support_premier_analysis.fact_case 
+            WHERE CASE_NBR=?
+        )
+        SELECT 0, c.CASE_ID, c.SUBJECT_TXT, c.ENV_DETAIL_DSC, c.ISS_CASE_DESCRIPTION_DSC, 
+               c.BACKEND_ID, c.CORE_ISSUE_SUBCATEGORY_EXTERNAL_TXT, NULL, NULL, NULL
+        FROM c
+        UNION ALL
+        SELECT 1, NULL, NULL, NULL, NULL, NULL, NULL,
+               m.CORE_IPS_CREATED_DTM, m.CORE_IPS_COMMENT_AUTHOR_TYPE_TXT, m.CORE_IPS_CASE_COMMENT_TXT 
+        FROM SALES_MARKETING.SALES_SUPPORT_PREMIER_ANALYSIS.DIM_CORE_IPS_CASE_COMMENTS m
+        JOIN c ON m.CORE_IPS_CASE_ID = c.CASE_ID {comment_filter}
+        ORDER BY 1, 8
+        """
+        params = (CaseService._case_nbr_param(case_nbr),)
+        params += (since,) if since is not None else ()
+        schema = "sales_support_premier_analysis.fact_case"
+        rows = snowflake_query(passwd, sql_query, schema, fetch_mode="all", params=params)
+
+        if not rows or rows[0][0] != 0:
+            return None
+
+        case_id, subject, env_detail, description, backend_id, subcategory = rows[0][1:7]
+        case_fields = (case_id, subject, parse_html_table(env_detail), description, backend_id, subcategory)
+        comments = [list(row[7:]) for row in rows[1:] if row[9] is not None]
+        return case_fields, comments
+
+    @staticmethod
+    def _get_case_data(case_nbr, passwd):
+        """
+        (case_fields, comments, att_info, changed) for a case number, or None when not found.
+        With app_config.case_cache set, a known case only syncs comments newer than the
+        latest one held (nothing at all if synced within fresh_sec). `changed` is False
+        when nothing new came in since the last visit.
+        """
+        cache = app_config.case_cache
+        if cache is None:
+            case_data = CaseService._get_case_with_comments_from_snowflake(case_nbr[2:], passwd)
+            if case_data is None:
+                return None
+            case_fields, comments = case_data
+            return (case_fields, *CaseService._process_comments(comments), True)
+
+        cached = cache.get(case_nbr)
+        if cached is not None and cache.is_fresh(cached):
+            cache.mark_hit()
+            print(f"(case cache) {case_nbr}: synced {time.time() - cached.synced:.0f}s ago, skip Snowflake")
+            return (cached.case_fields, *CaseService._process_comments(cached.comments), False)
+
+        since = cached.latest_comment_dtm if cached is not None else None
+        try:
+            case_data = CaseService._get_case_with_comments_from_snowflake(case_nbr[2:], passwd, since)
+        except Exception as e:
+            if cached is None:
+                raise
+            print(f"(case cache) {case_nbr}: Snowflake sync failed ({e}), using cached copy")
+            return (cached.case_fields, *CaseService._process_comments(cached.comments), False)
+        if case_data is None:
+            return None
+
+        case_fields, new_comments = case_data
+        inserted = cache.save(case_nbr, case_fields, new_comments, since)
+        changed = cached is None or inserted > 0 or tuple(case_fields) != tuple(cached.case_fields)
+        # `since` is inclusive, read the merged list back (boundary comments were replaced, not added)
+        comments = cache.get(case_nbr).comments
+        print(f"(case cache) {case_nbr}: {inserted} new comments since {since}")
+        return (case_fields, *CaseService._process_comments(comments), changed)
     
     @staticmethod
     def _download_pdf_by_url(case_id, download_path):
@@ -159,7 +242,8 @@ class CaseService:
             
         except Exception as e:
             print(f"link of case {case_nbr} not found: {e}")
-            flash(f"link of case {case_nbr} not found: {e}", "danger")
+            if has_request_context():
+                flash(f"link of case {case_nbr} not found: {e}", "danger")
             return None, None
         finally:
             driver.quit()
@@ -203,22 +287,3 @@ class CaseService:
                 if driver in driver_manager.all_drivers:
                     driver_manager.all_drivers.remove(driver)
             print(f"(download pdf) time total: {(time.time() - start_time):.2f}秒")
-    
-    @staticmethod
-    def _process_snowflake_data(case_context, case_fields, key):
-        (case_context.id, case_context.subject, case_context.env_detail, 
-         case_context.description, case_context.backend_id, case_context.subcategory) = case_fields
-        
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            comment_future = executor.submit(CaseService._get_case_comments_from_snowflake, case_context.id, key.snowflake_passwd)
-            pdf_future = executor.submit(CaseService._download_pdf_by_url, case_context.id, case_context.case_download_dir)
-            
-            case_context.comments, case_context.attachment_info = comment_future.result(timeout=100)
-            case_context.ips_pdf_path = pdf_future.result(timeout=100)
-            
-        return case_context
-    
- 
-    
-    
-    
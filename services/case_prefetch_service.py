@@ -0,0 +1,178 @@
+"""
+Background prefetch of IPS cases. Each queued case runs through
+CaseService.process_case (Snowflake case cache, IPS PDF, attachment list) and
+then analyze_desc in the batch lane (description summary + classification,
+kept in the LLM response cache), so opening the case later only hits caches.
+Runs without a Flask request or session.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from models.models import CaseContext
+from configs.global_configs import app_config
+from services.case_info_service import CaseService
+from services.llm_gateway import PRIORITY_BATCH
+from utils import helpers
+
+
+class CasePrefetcher:
+    # selenium PDF downloads / LLM calls in flight at once
+    CASE_WORKERS = 2
+    ANALYSIS_WORKERS = 4
+    # finished entries kept for /prefetch status
+    MAX_FINISHED = 200
+
+    def __init__(self, case_workers: Optional[int] = None, analysis_workers: Optional[int] = None,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.case_workers = case_workers or self.CASE_WORKERS
+        self.analysis_workers = analysis_workers or self.ANALYSIS_WORKERS
+        self.on_progress = on_progress
+        self.lock = threading.Lock()
+        self.cases: Dict[str, Dict[str, Any]] = {}
+        self.ready: Dict[str, threading.Event] = {}
+        self.case_pool: Optional[ThreadPoolExecutor] = None
+        self.analysis_pool: Optional[ThreadPoolExecutor] = None
+        self.clipboard_stop: Optional[threading.Event] = None
+
+    def _pools(self):
+        """ called under lock: thread pools are only started by the first enqueue """
+        if self.case_pool is None:
+            self.case_pool = ThreadPoolExecutor(max_workers=self.case_workers, thread_name_prefix="prefetch_case")
+            self.analysis_pool = ThreadPoolExecutor(max_workers=self.analysis_workers,
+                                                    thread_name_prefix="prefetch_analysis")
+        return self.case_pool, self.analysis_pool
+
+    def _update(self, case_nbr: str, **fields):
+        with self.lock:
+            entry = self.cases[case_nbr]
+            entry.update(fields)
+            snapshot = dict(entry)
+        if self.on_progress:
+            try:
+                self.on_progress(snapshot)
+            except Exception as e:
+                print(f"Prefetch progress callback failed: {e}")
+
+    #---------------- queue ---------------
+    def enqueue(self, case_nbrs: Iterable[str], analyze: bool = True) -> Dict[str, List[str]]:
+        """ queue cases that are not already queued or running; returns added / skipped """
+        added, skipped = [], []
+        with self.lock:
+            case_pool, _ = self._pools()
+            for case_nbr in case_nbrs:
+                entry = self.cases.get(case_nbr)
+                if entry is not None and entry["state"] in ("queued", "fetching", "analyzing"):
+                    skipped.append(case_nbr)
+                    continue
+                self.cases[case_nbr] = {"case_nbr": case_nbr, "state": "queued", "queued": time.time(),
+                                        "error": None}
+                self.ready[case_nbr] = threading.Event()
+                case_pool.submit(self._prefetch_case, case_nbr, analyze)
+                added.append(case_nbr)
+            self._trim()
+        if added:
+            print(f"(prefetch) queued {len(added)} cases: {added}")
+        return {"added": added, "skipped": skipped}
+
+    def _trim(self):
+        """ called under lock: forget the oldest finished entries """
+        finished = [entry for entry in self.cases.values() if entry["state"] in ("done", "failed")]
+        for entry in sorted(finished, key=lambda e: e["queued"])[:max(len(finished) - self.MAX_FINISHED, 0)]:
+            self.cases.pop(entry["case_nbr"], None)
+            self.ready.pop(entry["case_nbr"], None)
+
+    def _prefetch_case(self, case_nbr: str, analyze: bool):
+        start = time.time()
+        self._update(case_nbr, state="fetching", started=start)
+        try:
+            case_context = CaseService.process_case(CaseContext(case_nbr=case_nbr))
+        except Exception as e:
+            case_context = None
+            error = f"fetch failed: {e}"
+        else:
+            error = case_context.error_message
+        finally:
+            self.ready[case_nbr].set()
+
+        if error:
+            print(f"(prefetch) {case_nbr}: {error}")
+            self._update(case_nbr, state="failed", error=error, finished=time.time())
+            return
+        self._update(case_nbr, fetch_sec=round(time.time() - start, 2),
+                     attachments=len(case_context.attachment_list or []))
+
+        if analyze and app_config.llm_helper is not None and app_config.llm_helper.gateway is not None:
+            self._update(case_nbr, state="analyzing")
+            self.analysis_pool.submit(self._analyze_case, case_context)
+        else:
+            self._update(case_nbr, state="done", finished=time.time())
+
+    def _analyze_case(self, case_context: CaseContext):
+        start = time.time()
+        try:
+            # same prompt and case dict as /llm/get_llm_analysis, so the later request is a cache hit
+            prompt_path = CaseService.load_case_summary_prompt(case_context.wifi_or_bt)
+            result = app_config.llm_helper.analyze_desc(prompt_path, case_context.to_dict(), use_cache=True,
+                                                       priority=PRIORITY_BATCH)
+            classification = result.get("Classification", {}) if isinstance(result, dict) else {}
+            self._update(case_context.case_nbr, state="done", finished=time.time(),
+                         analysis_sec=round(time.time() - start, 2), issue_type=classification.get("issue_type"))
+        except Exception as e:
+            print(f"(prefetch) {case_context.case_nbr}: analysis failed: {e}")
+            self._update(case_context.case_nbr, state="failed", error=f"analysis failed: {e}", finished=time.time())
+
+    def wait(self, case_nbr: str, timeout: float = 300) -> bool:
+        """ block until an in-flight prefetch of case_nbr has its case data and PDF on disk """
+        with self.lock:
+            event = self.ready.get(case_nbr)
+        if event is None:
+            return False
+        if not event.is_set():
+            print(f"(prefetch) {case_nbr} is being prefetched, waiting for it")
+        return event.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = sorted((dict(entry) for entry in self.cases.values()), key=lambda e: e["queued"])
+        counts: Dict[str, int] = {}
+        for entry in entries:
+            counts[entry["state"]] = counts.get(entry["state"], 0) + 1
+        return {"counts": counts, "cases": entries, "watching_clipboard": self.clipboard_stop is not None}
+
+    #---------------- clipboard ---------------
+    def start_clipboard_watch(self, interval: float = 1.0, analyze: bool = True):
+        """ prefetch every case number copied to the clipboard from now on """
+        with self.lock:
+            if self.clipboard_stop is not None:
+                return
+            stop = self.clipboard_stop = threading.Event()
+
+        def watch():
+            last = None
+            while not stop.wait(interval):
+                try:
+                    case_nbr = helpers.get_clipboard_case_number()
+                except Exception as e:
+                    print(f"(prefetch) clipboard read failed: {e}")
+                    continue
+                if case_nbr and case_nbr != last:
+                    last = case_nbr
+                    self.enqueue([case_nbr], analyze)
+
+        threading.Thread(target=watch, name="prefetch_clipboard", daemon=True).start()
+
+    def stop_clipboard_watch(self):
+        with self.lock:
+            stop, self.clipboard_stop = self.clipboard_stop, None
+        if stop is not None:
+            stop.set()
+
+
+def _emit_progress(entry: Dict[str, Any]):
+    if app_config.socketio is not None:
+        app_config.socketio.emit('prefetch_progress', entry, namespace='/progress')
+
+
+case_prefetcher = CasePrefetcher(on_progress=_emit_progress)
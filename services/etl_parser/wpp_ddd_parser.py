@@ -12,6 +12,7 @@ and your desired filters
 """
 
 import re
+import mmap
 import argparse
 import logging
 import os
@@ -512,12 +513,14 @@ class WppParser(Parser):
         # list of tuples (jenkins_build_id, os_name, pdb_name)
         builds_db = []
 
-        with open(self.local_log_file_name, "rb") as etl_file:
-            # convert binary to string
-            file_str = str(etl_file.read())
+        # mmap cannot map an empty file, and an empty ETL has no build info anyway
+        if os.path.getsize(self.local_log_file_name) == 0:
+            return builds_db
 
-            # get first occurrence
-            builds = [i.start() for i in re.finditer("Jenkins", file_str)]
+        with open(self.local_log_file_name, "rb") as etl_file, \
+                mmap.mmap(etl_file.fileno(), 0, access=mmap.ACCESS_READ) as etl_map:
+            # search the raw bytes, only the windows after each hit are converted to string
+            builds = [i.start() for i in re.finditer(b"Jenkins", etl_map)]
             # walk over all indices (there can be only one though) and update the variables with highest build ID
             for start_index in builds:
                 # init vars
@@ -526,7 +529,8 @@ class WppParser(Parser):
                 pdb_name = ""
 
                 # find some substring stating with Jenkins
-                substring = file_str[start_index : (start_index + 200)]
+                # (same text the old str(whole_file) scan saw: escaped bytes, 200 chars)
+                substring = str(etl_map[start_index : (start_index + 200)])[2:-1][:200]
 
                 # C:\Jenkins\workspace\windows-wifi-driver\WIFI_DRV\104479\Source_Full\drv\
                 # win_driver\Win_Driver\Miniport\WinT\obj_rel_winTx64\Netwtw10.pdb
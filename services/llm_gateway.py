@@ -0,0 +1,165 @@
+"""
+App-wide gateway in front of the ExpertGPT client.
+
+Every LLM_helper request goes through one LLMGateway. It provides:
+- one pooled keep-alive httpx client
+- a cap on requests in flight, with slots kept free for interactive calls
+- a token bucket for the request rate
+- jittered exponential backoff on 429 / 5xx / connection errors
+"""
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import openai
+
+
+# interactive: someone is waiting on the page (desc analysis, single log analysis, reduce)
+# batch: fan-out work whose latency matters less (chunked log windows, bulk classification)
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                    openai.InternalServerError)
+
+
+class TokenBucket:
+    """ refills `rate` tokens per second up to `capacity`; acquire() blocks until a token is free """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """ returns the seconds spent waiting """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LLMGateway:
+
+    def __init__(self, api_key: str, base_url: str, max_concurrency: int = 8, interactive_reserve: int = 2,
+                 requests_per_minute: float = 120, burst: int = 10, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0, timeout: float = 300.0):
+        self.max_concurrency = max_concurrency
+        # batch calls never take the last `interactive_reserve` slots
+        self.interactive_reserve = min(interactive_reserve, max_concurrency - 1)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+
+        self.http_client = httpx.Client(
+            proxy=None, verify=False, trust_env=False,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency,
+                                keepalive_expiry=60),
+            timeout=httpx.Timeout(timeout, connect=10.0)
+        )
+        # retries are done here, with the concurrency slot released while backing off
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client,
+                                    max_retries=0)
+
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+        self.counters = {'requests': 0, 'retries': 0, 'failures': 0, 'rate_limited': 0,
+                         'queue_wait_sec': 0.0, 'throttle_wait_sec': 0.0}
+
+    # -------------------- concurrency governor -------------
+    def _can_start(self, priority: str) -> bool:
+        if priority == PRIORITY_INTERACTIVE:
+            return self.in_flight < self.max_concurrency
+        return (self.in_flight < self.max_concurrency - self.interactive_reserve
+                and self.waiting[PRIORITY_INTERACTIVE] == 0)
+
+    @contextmanager
+    def slot(self, priority: str = PRIORITY_INTERACTIVE):
+        start = time.monotonic()
+        with self.cond:
+            self.waiting[priority] += 1
+            try:
+                self.cond.wait_for(lambda: self._can_start(priority))
+            finally:
+                self.waiting[priority] -= 1
+            self.in_flight += 1
+            self.counters['queue_wait_sec'] += time.monotonic() - start
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+
+    def _count(self, name: str, value: float = 1):
+        with self.cond:
+            self.counters[name] += value
+
+    # -------------------- requests -------------
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """ server Retry-After when given, else full-jitter exponential backoff """
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay) + random.uniform(0, self.base_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn: Callable[..., Any], *args, priority: str = PRIORITY_INTERACTIVE,
+             can_retry: Optional[Callable[[], bool]] = None, **kwargs) -> Any:
+        """
+        run fn(*args, **kwargs) inside a slot, rate limited, retrying transient API errors.
+        can_retry() returning False makes a failed attempt final (e.g. a stream that
+        already sent tokens to the client and cannot be replayed).
+        """
+        for attempt in range(self.max_retries + 1):
+            # wait for the rate limit before taking a slot, so a throttled caller does not hold one
+            self._count('throttle_wait_sec', self.bucket.acquire())
+            with self.slot(priority):
+                self._count('requests')
+                try:
+                    return fn(*args, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, openai.RateLimitError):
+                        self._count('rate_limited')
+                    if attempt == self.max_retries or (can_retry is not None and not can_retry()):
+                        self._count('failures')
+                        raise
+                    delay = self._retry_delay(attempt, e)
+                    print(f"LLM request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} "
+                          f"in {delay:.1f}s")
+            self._count('retries')
+            time.sleep(delay)
+
+    def chat_completion(self, priority: str = PRIORITY_INTERACTIVE, **params) -> Any:
+        return self.call(self.client.chat.completions.create, priority=priority, **params)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.cond:
+            return {
+                'in_flight': self.in_flight,
+                'waiting': dict(self.waiting),
+                'max_concurrency': self.max_concurrency,
+                'interactive_reserve': self.interactive_reserve,
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.counters.items()},
+            }
+
+    def close(self):
+        self.http_client.close()
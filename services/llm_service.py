@@ -1,11 +1,21 @@
 import requests
 import json
 import re
+import time
 import urllib3
 import openai
 import httpx
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 from utils import helpers
+from utils.log_compaction import split_log_lines
+from utils.token_counter import count_tokens
+from utils.llm_cache import LLMResponseCache, make_cache_key
+from utils.llm_telemetry import LLMTelemetry
+from utils.issue_classifier import classify_issue_locally
+from utils.case_prompt import serialize_case_context
+from utils.prompt_registry import prompt_registry
+from services.llm_gateway import LLMGateway, PRIORITY_INTERACTIVE, PRIORITY_BATCH
 
 
 access_token = None
@@ -18,25 +28,81 @@ class LLM_helper:
             'https': 'http://proxy-dmz.intel.com:912',
         }
         self.client = None
+        self.gateway: LLMGateway = None
+        self.model = None
+        self.response_cache: LLMResponseCache = None
+        self.telemetry: LLMTelemetry = None
+        # model context size and the completion reserved for analyze_log
+        self.context_window = 128000
+        self.log_max_tokens = 8000
+        # token budget for the case text in classify_issue / analyze_desc prompts
+        self.case_context_budget = 4000
+        # classify_issue runs next to the analyze_desc completion on this pool
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm_helper")
+        self.classify_timeout = 60
+        # rule-based classification at or above this confidence skips the LLM call (above 1 disables)
+        self.local_classify_threshold = 0.75
         self.issue_categories = ["BSOD", "Yellow Bang (YB)", "Connectivity", "PPAG", 
                                 "MLO", "Assert", "WRDS/WGDS/EWRD/SGOM", "TAS", "Roaming", 
                                 "P2P", "DSM", "VLP/UHB/AFC", "UATS", "Unclassified"]
 
-    def set_up(self, expertgpt_token, expertgpt_url, model="gpt-4.1",classifitation_path=None):
+    def set_up(self, expertgpt_token, expertgpt_url, model="gpt-4.1",classifitation_path=None, context_window=None,
+               **gateway_options):
         openai.api_key = expertgpt_token
-        self.client = openai.OpenAI(
-            api_key=expertgpt_token,
-            http_client=httpx.Client(proxy=None, verify=False, trust_env=False),
-            base_url=expertgpt_url
-        )
+        # all requests share the gateway's pooled client, concurrency slots, rate limit and retries
+        if self.gateway is not None:
+            self.gateway.close()
+        self.gateway = LLMGateway(expertgpt_token, expertgpt_url, **gateway_options)
+        self.client = self.gateway.client
         self.model = model
+        if context_window:
+            self.context_window = context_window
         self.classifitation_path  = None
         if Path(classifitation_path).exists():
             self.classifitation_path = classifitation_path
         print("classifitation_path", classifitation_path, self.classifitation_path)
     
     
-    def classify_issue(self, case_context: dict):
+    def set_response_cache(self, response_cache: LLMResponseCache):
+        self.response_cache = response_cache
+
+    def set_telemetry(self, telemetry: LLMTelemetry):
+        self.telemetry = telemetry
+
+    def _record(self, caller, start=None, usage=None, finish_reason=None, cache_hit=False, streamed=False,
+                error=None, messages=None, content=None):
+        """ one telemetry row per request; streamed calls get no usage, their tokens are counted locally """
+        if self.telemetry is None:
+            return
+        latency_ms = (time.perf_counter() - start) * 1000 if start is not None else 0.0
+        prompt_tokens = completion_tokens = 0
+        estimated = False
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        elif messages is not None:
+            model = self.model or "gpt-4.1"
+            prompt_tokens = count_tokens("\n".join(str(m.get("content") or "") for m in messages), model)
+            completion_tokens = count_tokens(content or "", model)
+            estimated = True
+        self.telemetry.record(caller, self.model, prompt_tokens, completion_tokens, round(latency_ms, 1),
+                              finish_reason, cache_hit, streamed, estimated,
+                              f"{type(error).__name__}: {error}" if error is not None else None)
+
+    def _cache_get(self, kind, prompt, case_context):
+        if self.response_cache is None:
+            return None, None
+        key = make_cache_key(kind, self.model, prompt, case_context)
+        result = self.response_cache.get(key)
+        print(f"llm cache {'hit' if result is not None else 'miss'} ({kind}):", self.response_cache.stats())
+        if result is not None:
+            self._record(kind, cache_hit=True)
+        return key, result
+
+    def _cache_set(self, key, kind, result):
+        if self.response_cache is not None and key is not None and result:
+            self.response_cache.set(key, result, kind)
+
+    def classify_issue(self, case_context: dict, use_cache=True, priority=PRIORITY_INTERACTIVE):
         classify_prompt = "Analyze the content and classify into the most appropriate category based on the primary issue described:"
         # debug only:shared folder failed
         # if self.classifitation_path is not None:
@@ -66,6 +132,13 @@ class LLM_helper:
             Choose the category that best matches the PRIMARY issue described in the content. If multiple categories could apply, select the one that represents the main problem.
 
             """
+
+        # unambiguous cases are settled by the local rules, the model only sees the rest
+        local_result = classify_issue_locally(case_context, self.issue_categories)
+        if local_result["confidence"] >= self.local_classify_threshold:
+            print("local classification:", local_result)
+            self._record("classify_rules", cache_hit=True)
+            return local_result
         
         tool_schema = {
             "type": "function",
@@ -98,13 +171,20 @@ class LLM_helper:
         }
         
         user_content = f"""
-        Case Description: {case_context}
+        Case Description: {self.case_prompt(case_context)}
         
         {classify_prompt}
         """
+
+        cache_key, cached = self._cache_get("classify", classify_prompt + json.dumps(self.issue_categories), case_context) if use_cache else (None, None)
+        if cached is not None:
+            return cached
         
+        response = None
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
+            response = self.gateway.chat_completion(
+                priority,
                 model=self.model,
                 messages=[{
                     "role": "user", 
@@ -115,6 +195,7 @@ class LLM_helper:
                 temperature=0.1,
                 max_tokens=300
             )
+            self._record("classify", start, response.usage, response.choices[0].finish_reason)
 
             print("user_content", user_content)
             
@@ -122,6 +203,7 @@ class LLM_helper:
             if tool_calls and len(tool_calls) > 0:
                 function_call = tool_calls[0].function
                 result = json.loads(function_call.arguments)
+                self._cache_set(cache_key, "classify", result)
                 return result
             else:
                 content = response.choices[0].message.content
@@ -129,28 +211,48 @@ class LLM_helper:
                 
         except Exception as e:
             print(f"Classification failed: {e}")
+            if response is None:
+                self._record("classify", start, error=e)
             return {
                 "issue_type": "Unclassified",
                 "confidence": 0,
-                "keywords_found": []
+                "keywords_found": [],
+                "source": "error",
+                "error": f"classification failed: {e}"
             }
 
-    def analyze_desc(self, prompt_path, case_context: dict):
-        
-        prompt = helpers.load_module(prompt_path,"analyze_prompt_module" )
+    def case_prompt(self, case_context):
+        """ triage fields of the case, deduped and capped to case_context_budget tokens """
+        return serialize_case_context(case_context, self.case_context_budget, self.model or "gpt-4.1")
+
+    def _fallback_classification(self, content, case_context):
+        """ the model answered in text instead of the tool call: take a category it names, else the local rules """
+        for category in self.issue_categories:
+            if category != "Unclassified" and content and category.lower() in content.lower():
+                return {"issue_type": category, "confidence": 0.5, "keywords_found": []}
+        return classify_issue_locally(case_context, self.issue_categories)
+
+    def analyze_desc(self, prompt_path, case_context: dict, use_cache=True, on_token=None, priority=PRIORITY_INTERACTIVE):
         
         system_content = (
-           prompt.SYS_PROMPT
+           prompt_registry.get_sys_prompt(prompt_path)
         )
         user_content = (
-            f"""{case_context}"""
+            f"""{self.case_prompt(case_context)}"""
         )
         print("client:", self.client)
 
-        classification_result = self.classify_issue(case_context)
-        print("classification_result", classification_result)
+        cache_key, cached = self._cache_get("analyze_desc", system_content + json.dumps(self.issue_categories), case_context) if use_cache else (None, None)
+        if cached is not None:
+            return cached
+
+        # both round trips in flight at once, classification is joined after the main completion
+        classification_future = self.executor.submit(self.classify_issue, case_context, use_cache, priority)
         try:
-            response = self.client.chat.completions.create(
+            raw_output, _, _ = self._create_completion(
+                on_token=on_token,
+                priority=priority,
+                caller="analyze_desc",
                 model=self.model,  
                 messages=[
                     {
@@ -171,12 +273,13 @@ class LLM_helper:
             )
 
             
-            raw_output = response.choices[0].message.content
             print("raw_output:", raw_output)
             json_match = re.search(r'\{.*\}', raw_output, re.DOTALL)
             if json_match:
                 json_str = json_match.group(0)
                 result = json.loads(json_str)
+                classification_result = self._join_classification(classification_future)
+                print("classification_result", classification_result)
                 if classification_result:
                     result["Classification"] = classification_result
                 else:
@@ -186,6 +289,9 @@ class LLM_helper:
                         "keywords_found": []
                     }
                 print("json output:",type(result), result)
+                # a timed-out/failed classification is not worth keeping
+                if classification_result and classification_result.get("issue_type") != "Unclassified":
+                    self._cache_set(cache_key, "analyze_desc", result)
                 return result
             else:
                 print("raw output:", raw_output)
@@ -194,70 +300,168 @@ class LLM_helper:
             print(f"Failed to make inference request: {e}")
             return {}
     
-    def analyze_log(self, system_content, log=None):
+    def _join_classification(self, classification_future):
+        try:
+            return classification_future.result(timeout=self.classify_timeout)
+        except TimeoutError:
+            print(f"Classification timed out after {self.classify_timeout}s")
+        except Exception as e:
+            print(f"Classification failed: {e}")
+        return None
+
+    def log_token_budget(self, system_content, margin=1000):
+        """ tokens left for the log in analyze_log after the system prompt and the completion """
+        used = count_tokens(system_content, self.model or "gpt-4.1") + self.log_max_tokens + margin
+        return max(self.context_window - used, 0)
+
+    def _create_completion(self, on_token=None, priority=PRIORITY_INTERACTIVE, caller="completion", **params):
+        """
+        chat completion through the gateway, returning (content, finish_reason, usage).
+        With on_token the completion is streamed and each content delta is passed
+        to on_token(text) as it arrives; usage is None when streamed.
+        """
+        start = time.perf_counter()
+        try:
+            if on_token is None:
+                response = self.gateway.chat_completion(priority, **params)
+                choice = response.choices[0]
+                result = choice.message.content, choice.finish_reason, response.usage
+            else:
+                # deltas already shown to the client cannot be taken back, so only retry before the first one
+                emitted = []
+                def forward(text):
+                    emitted.append(True)
+                    on_token(text)
+                result = self.gateway.call(self._stream_completion, forward, priority=priority,
+                                           can_retry=lambda: not emitted, **params)
+        except Exception as e:
+            self._record(caller, start, streamed=on_token is not None, error=e)
+            raise
+        content, finish_reason, usage = result
+        self._record(caller, start, usage, finish_reason, streamed=on_token is not None,
+                     messages=params.get("messages"), content=content)
+        return result
+
+    def _stream_completion(self, on_token, **params):
+        parts, finish_reason = [], None
+        for chunk in self.client.chat.completions.create(stream=True, **params):
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta.content if choice.delta else None
+            if delta:
+                parts.append(delta)
+                on_token(delta)
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+        return "".join(parts), finish_reason, None
+
+    def _log_completion(self, system_content, user_content, on_token=None, priority=PRIORITY_INTERACTIVE,
+                        caller="analyze_log"):
+        content, finish_reason, usage = self._create_completion( #model=classification_info.tmp_model,
+            on_token=on_token,
+            priority=priority,
+            caller=caller,
+            model=self.model,  
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_content
+                },
+                {
+                    "role": "user", 
+                    "content": user_content
+                }
+            ],
+            temperature=0.2,
+            top_p=0.9,
+            frequency_penalty=0.1,
+            presence_penalty=0,
+            max_tokens=self.log_max_tokens,
+            stop=None
+        )
+
+        if usage is not None:
+            print(f"usage: {usage}")
+            print(f"輸入 tokens: {usage.prompt_tokens}")
+            print(f"輸出 tokens: {usage.completion_tokens}")
+            print(f"總計 tokens: {usage.total_tokens}")
+        print(f"是否被截斷: {finish_reason}")
+        return content
+
+    @staticmethod
+    def _parse_log_output(raw_output):
+        json_match = re.search(r'\{.*\}', raw_output, re.DOTALL)
+        if json_match:
+            json_str = json_match.group(0)
+            result = json.loads(json_str)
+            #print("json output:",type(result), result)
+            return result
+        else:
+            #print("raw output:", raw_output)
+            return raw_output
+
+    def analyze_log(self, system_content, log=None, on_token=None):
 
         user_content = (
             f"""logs: {log}\n"""
         )
         print("client:", self.client)
         try:
-            response = self.client.chat.completions.create( #model=classification_info.tmp_model,
-                model=self.model,  
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_content
-                    },
-                    {
-                        "role": "user", 
-                        "content": user_content
-                    }
-                ],
-                temperature=0.2,
-                top_p=0.9,
-                frequency_penalty=0.1,
-                presence_penalty=0,
-                max_tokens=8000,
-                stop=None
-            )
-            #"""
+            raw_output = self._log_completion(system_content, user_content, on_token)
+            return self._parse_log_output(raw_output)
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to make inference request: {e}")
+            return {}
 
-            """params = {
-                "model": classification_info.tmp_model,
-                "messages": [
-                    {"role": "system", "content": system_content},
-                    {"role": "user",   "content": user_content},
-                ],
-                "temperature": 0.2,
-                "top_p": 0.9,
-                "frequency_penalty": 0.1,
-                "presence_penalty": 0,
-                "stop": None
-            }
+    def analyze_log_chunked(self, system_content, log_lines, chunk_budget, max_workers=4, progress_callback=None,
+                            on_token=None):
+        """
+        Map-reduce analyze_log for logs larger than one context window: the
+        time-ordered lines are split into windows of at most chunk_budget tokens,
+        windows are analyzed concurrently (max_workers at a time), then one
+        reduce call merges the partial findings into the format the system
+        prompt asks for. progress_callback(done, total) is called per window;
+        on_token only streams the reduce call, the windows are not shown.
+        """
+        chunks = split_log_lines(log_lines, chunk_budget, self.model or "gpt-4.1")
+        if len(chunks) <= 1:
+            return self.analyze_log(system_content, "\n".join(log_lines), on_token)
 
-            if getattr(classification_info, "max_token", None) is not None:
-                params["max_tokens"] = classification_info.max_token
-            """
-            
-            #response = self.client.chat.completions.create(**params)
+        total = len(chunks)
+        print(f"analyze_log_chunked: {len(log_lines)} lines in {total} windows")
 
-            print(f"usage: {response.usage}")
-            print(f"輸入 tokens: {response.usage.prompt_tokens}")
-            print(f"輸出 tokens: {response.usage.completion_tokens}")
-            print(f"總計 tokens: {response.usage.total_tokens}")
-            print(f"是否被截斷: {response.choices[0].finish_reason}")
+        def analyze_chunk(idx):
+            user_content = (
+                f"""logs (part {idx + 1} of {total}, in time order; other parts are analyzed separately, """
+                f"""report only what this part shows):\n""" + "\n".join(chunks[idx]) + "\n"
+            )
+            return self._log_completion(system_content, user_content, priority=PRIORITY_BATCH,
+                                        caller="analyze_log_window")
 
-            print(f"response: {response}")
-            raw_output = response.choices[0].message.content
-            json_match = re.search(r'\{.*\}', raw_output, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                result = json.loads(json_str)
-                #print("json output:",type(result), result)
-                return result
-            else:
-                #print("raw output:", raw_output)
-                return raw_output
+        partials = [None] * total
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(analyze_chunk, idx): idx for idx in range(total)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                idx = futures[future]
+                try:
+                    partials[idx] = future.result()
+                except Exception as e:
+                    print(f"Log window {idx + 1}/{total} failed: {e}")
+                    partials[idx] = f"(analysis of this part failed: {e})"
+                if progress_callback:
+                    progress_callback(done, total)
+
+        reduce_content = (
+            f"""The log was too large for one request, so it was split into {total} time-ordered parts """
+            f"""and each part was analyzed on its own. Merge the partial analyses below into one final """
+            f"""analysis of the whole log, in exactly the output format required above. Keep the timeline """
+            f"""in order and combine findings that repeat across parts.\n\n"""
+            + "\n\n".join(f"### Part {idx + 1}/{total}\n{partial}" for idx, partial in enumerate(partials))
+        )
+        try:
+            raw_output = self._log_completion(system_content, reduce_content, on_token, caller="analyze_log_reduce")
+            return self._parse_log_output(raw_output)
         except requests.exceptions.RequestException as e:
             print(f"Failed to make inference request: {e}")
             return {}
@@ -4,6 +4,7 @@ from typing import Dict, Any
 
 from configs.path_configs import LOG_PARSER_DIR
 from utils.log_parser_file_utils import get_available_filters, get_available_prompts
+from utils.prompt_registry import prompt_registry
 
 class FileManagerService:
     def __init__(self):
@@ -78,6 +79,7 @@ class FileManagerService:
                 return jsonify({'success': False, 'message': f'File "{file.filename}" already exists'})
             
             file.save(file_path)
+            prompt_registry.invalidate(file_path)
 
             available_prompts, available_custom_prompts = get_available_prompts(LOG_PARSER_DIR)
             
@@ -103,6 +105,7 @@ class FileManagerService:
             '''
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(file_content)
+            prompt_registry.invalidate(file_path)
 
             available_prompts, available_custom_prompts = get_available_prompts(project_root)
             
@@ -133,6 +136,7 @@ class FileManagerService:
             '''
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(file_content)
+            prompt_registry.invalidate(file_path)
 
             available_prompts, available_custom_prompts = get_available_prompts(project_root)
             
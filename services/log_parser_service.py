@@ -1,11 +1,12 @@
 # services/log_parser_service.py
 import os
+import html
 import shutil
 import datetime
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import session
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import markdown
 
 from configs.path_configs import LOG_PARSER_DIR
@@ -17,14 +18,28 @@ from utils.log_parser_file_utils import (
     get_sys_prompt_content
 )
 from utils.log_parser_preprocess import (
-    filter_log_by_keywords, extract_enabled_keywords_from_filter_file,
-    preprocess_log_for_llm, group_similar_logs)
+    iter_filter_log_by_keywords, load_filter_program,
+    iter_preprocess_log_for_llm, LogGroups,
+    parallel_filter_and_group, get_log_normalizer)
+from utils.log_parser_cache import LogArtifactCache
+from utils.log_template_miner import mine_log_templates, template_miner_digest
+from utils.log_compaction import compact_log_lines
+from utils.socket_stream import SocketTokenStream
 
 
 
 class LogParserService:
+    # logs at least this big are filtered in a process pool when no mode is requested
+    PARALLEL_MIN_BYTES = 256 * 1024 * 1024
+    # chunked analysis: at most this many context windows, analyzed this many at a time
+    MAX_LOG_CHUNKS = 8
+    LOG_CHUNK_WORKERS = 4
+    # multi-prompt analysis: prompts analyzed at the same time
+    MAX_PROMPT_FANOUT = 4
+
     def __init__(self):
         self.log_parser_dir = LOG_PARSER_DIR
+        self.artifact_cache: Optional[LogArtifactCache] = None
         self.progress_status = {
             'percentage': 0,
             'message': 'Ready',
@@ -106,15 +121,39 @@ class LogParserService:
         file_path = os.path.join(prompt_dir, prompt_file)
         return get_sys_prompt_content(file_path)
 
+    def load_extra_prompts(self, selections) -> List[Tuple[str, str]]:
+        """ [{'type': 'template'|'custom', 'file': 'x.py'}, ...] -> [(name, SYS_PROMPT), ...], unknown/empty skipped """
+        prompts = []
+        for selection in selections or []:
+            prompt_file = os.path.basename(selection.get('file') or '')
+            if not prompt_file:
+                continue
+            content = self.load_prompt_content(selection.get('type'), prompt_file)
+            if content:
+                prompts.append((prompt_file, content))
+        return prompts
+
     #-------------- analyze progress ------------------
 
     def start_analysis(self, filter_path: str, log_path: str, output_dir: str, 
-                      llm_helper, custom_prompt_content: str) -> bool:
+                      llm_helper, custom_prompt_content: str, parallel: Optional[bool] = None,
+                      chunked: Optional[bool] = None, stream: bool = False,
+                      extra_prompts: Optional[List[Tuple[str, str]]] = None) -> bool:
         try:
-            thread = threading.Thread(
-                target=self.process_analysis,
-                args=(filter_path, log_path, output_dir, llm_helper, custom_prompt_content)
-            )
+            if extra_prompts:
+                # several prompts: one preprocessing pass, prompts fanned out (not streamed)
+                prompts = [("Current prompt", custom_prompt_content)] + list(extra_prompts)
+                thread = threading.Thread(
+                    target=self.process_multi_analysis,
+                    args=(filter_path, log_path, output_dir, llm_helper, prompts),
+                    kwargs={'parallel': parallel, 'chunked': chunked}
+                )
+            else:
+                thread = threading.Thread(
+                    target=self.process_analysis,
+                    args=(filter_path, log_path, output_dir, llm_helper, custom_prompt_content),
+                    kwargs={'parallel': parallel, 'chunked': chunked, 'stream': stream}
+                )
             thread.daemon = True
             thread.start()
             return True
@@ -134,58 +173,203 @@ class LogParserService:
                     }, namespace='/progress')
         
 
-    def process_analysis(self, filter_path, log_path, output_dir, llm_helper, prompt):
+    def use_parallel_filter(self, log_path: str, parallel: Optional[bool] = None) -> bool:
+        if parallel is not None:
+            return parallel
+        try:
+            return os.path.getsize(log_path) >= self.PARALLEL_MIN_BYTES
+        except OSError:
+            return False
+
+    def get_artifact_cache(self) -> Optional[LogArtifactCache]:
+        if self.artifact_cache is None and app_config.avatarfiles_dir:
+            cache_dir = os.path.join(app_config.avatarfiles_dir, "log_parser_cache")
+            os.makedirs(cache_dir, exist_ok=True)
+            self.artifact_cache = LogArtifactCache(cache_dir)
+        return self.artifact_cache
+
+    def prepare_grouped_log(self, filter_path, log_path, output_dir, parallel=None) -> List[str]:
+        """
+        Filter, preprocess and mine log_path into the summary lines for the LLM.
+        Writes filtered.log and filtered_preprocessed.log into output_dir; results
+        are cached by log content + filter + normalizer, so prompt-only re-runs skip this.
+        """
+        # 1: Compile filter(tat), cached until the file changes
+        self.update_progress(35, "Loading filter...")
+        filter_program = load_filter_program(filter_path)
+
+        cache = self.get_artifact_cache()
+        cache_key = None
+        if cache is not None:
+            self.update_progress(40, "Checking preprocessed log cache...")
+            # normalizer rules and miner settings are hashed into the key, changing either re-mines
+            cache_key = cache.make_key(log_path, filter_program.digest, get_log_normalizer().version,
+                                       template_miner_digest())
+            cached = cache.load(cache_key, output_dir)
+            if cached is not None:
+                grouped, meta = cached
+                self.update_progress(70, f"Using cached preprocessed log ({meta.get('lines', '?')} filtered lines)")
+                return grouped
+
+        filtered_log_path = os.path.join(output_dir, "filtered.log")
+        if self.use_parallel_filter(log_path, parallel):
+            # 2: Filter and normalize byte ranges in a process pool, merged back in file order
+            workers = os.cpu_count() or 1
+            self.update_progress(55, f"Filtering log entries with {workers} processes...")
+            groups = parallel_filter_and_group(log_path, filter_program, filtered_log_path, workers)
+        else:
+            # 2: Stream read -> filter -> preprocess -> group, lines are never held all at once
+            #    the mmap reader only decodes lines whose raw bytes hit a keyword
+            self.update_progress(55, "Reading and filtering log entries...")
+            log_lines = helpers.iter_log_file_mmap(log_path, filter_program.bytes_regex)
+            filtered_log = iter_filter_log_by_keywords(log_lines, filter_program)
+            filtered_log = helpers.tee_to_file(filtered_log_path, filtered_log, ensure_newline=True)
+            processed_lines = iter_preprocess_log_for_llm(filtered_log)
+            groups = LogGroups().update(processed_lines)
+
+        # exact duplicates are folded first, then mined into templates for a denser LLM input
+        grouped = mine_log_templates(groups)
+        print(f"log templates: {groups.total} lines -> {len(groups.groups)} groups -> {len(grouped)} summary lines")
+
+        # 3: Save preprocessed log
+        self.update_progress(70, "Saving preprocessed log...")
+        helpers.save_file(os.path.join(output_dir, "filtered_preprocessed.log"), grouped, ensure_newline=True)
+
+        if cache is not None:
+            cache.store(cache_key, output_dir, {'lines': groups.total, 'groups': len(groups.groups),
+                                                'log_path': log_path, 'filter_path': filter_path})
+        return grouped
+
+    def run_llm_analysis(self, grouped, llm_helper, prompt, chunked=None, on_token=None, progress=None):
+        """
+        Compact the summary lines to the prompt's budget and run the (chunked if needed)
+        LLM analysis. progress(percentage, message) defaults to update_progress.
+        Returns (llm_result, compaction).
+        """
+        progress = progress or self.update_progress
+
+        # 4: Fit the summary into the model context (or into MAX_LOG_CHUNKS windows when chunked)
+        budget = llm_helper.log_token_budget(prompt)
+        allow_chunks = chunked is not False
+        total_budget = budget * self.MAX_LOG_CHUNKS if allow_chunks else budget
+        llm_lines, compaction = compact_log_lines(grouped, total_budget, llm_helper.model or "gpt-4.1")
+        print("log compaction:", compaction)
+        if compaction['lines_after'] < compaction['lines_before']:
+            progress(80, f"Log compacted to {compaction['tokens_after']} tokens "
+                         f"({compaction['lines_before'] - compaction['lines_after']} lines dropped)")
+
+        # 5: LLM analysis
+        if allow_chunks and (chunked or compaction['tokens_after'] > budget):
+            progress(85, "Running chunked LLM analysis...")
+            llm_result = llm_helper.analyze_log_chunked(
+                system_content=prompt,
+                log_lines=llm_lines,
+                chunk_budget=budget,
+                max_workers=self.LOG_CHUNK_WORKERS,
+                progress_callback=lambda done, total: progress(
+                    85 + int(10 * done / total), f"Analyzed log chunk {done}/{total}, merging when all are done..."),
+                on_token=on_token
+            )
+        else:
+            progress(85, "Running LLM analysis...")
+            llm_result = llm_helper.analyze_log(
+                system_content=prompt,
+                log="\n".join(llm_lines),
+                on_token=on_token
+            )
+        return llm_result, compaction
+
+    @staticmethod
+    def render_result(llm_result):
+        return markdown.markdown(llm_result, extensions=["fenced_code", "tables", "nl2br", "sane_lists", "codehilite"])
+
+    def process_analysis(self, filter_path, log_path, output_dir, llm_helper, prompt, parallel=None, chunked=None,
+                         stream=False):
 
         try:
             self.reset_log_parser()
             self.analysis_result['status'] = 'processing'
 
-            # 1: Reading log file
-            self.update_progress(35, "Reading log file...")
-            log_file = log_path
-            log_lines = helpers.read_log_file(log_file)
-            
-            # 2: Filter keywords(tat)
-            self.update_progress(40, "Extracting filter keywords...")
-            filter_keywords = extract_enabled_keywords_from_filter_file(filter_path)
-            
-            # 3: Filter keywords
-            self.update_progress(55, "Filtering log entries...")
-            filtered_log = filter_log_by_keywords(log_lines, filter_keywords)
-            helpers.save_file(os.path.join(output_dir, "filtered.log"), filtered_log, ensure_newline=True)
-            
-            # 4: Preprocess log
-            self.update_progress(70, "Preprocessing log for LLM...")
-            processed_lines = preprocess_log_for_llm(filtered_log)
-            grouped = group_similar_logs(processed_lines)
-            
+            grouped = self.prepare_grouped_log(filter_path, log_path, output_dir, parallel)
             save_filtered_log_path = os.path.join(output_dir, "filtered_preprocessed.log")
-            helpers.save_file(save_filtered_log_path, grouped, ensure_newline=True)
             
-            # 5: LLM analysis
-            self.update_progress(85, "Running LLM analysis...")
-            llm_result = llm_helper.analyze_log(
-                system_content=prompt,
-                log=str(grouped)
-            )
+            # 4-5: compaction + LLM, the final completion is forwarded as 'analysis_stream' deltas when streaming
+            token_stream = SocketTokenStream(app_config.socketio, 'analysis_stream') if stream else None
+            llm_result, compaction = self.run_llm_analysis(grouped, llm_helper, prompt, chunked, token_stream)
+            if token_stream is not None:
+                token_stream.flush()
             
             # 6: done
             self.update_progress(100, "Analysis completed!")
             
             # save result
-            self.analysis_result['llm_result_html'] = markdown.markdown(llm_result, 
-                                                                extensions=["fenced_code", "tables", "nl2br", "sane_lists", "codehilite"])
+            self.analysis_result['llm_result_html'] = self.render_result(llm_result)
             self.analysis_result['log_output_path'] = save_filtered_log_path
+            self.analysis_result['compaction'] = compaction
             app_config.socketio.emit('analysis_completed', {
                 'success': True,
                 'result_html': self.analysis_result['llm_result_html'],
-                'log_output_path': self.analysis_result['log_output_path']
+                'log_output_path': self.analysis_result['log_output_path'],
+                'compaction': compaction
             }, namespace='/progress')
             return True
             
         except Exception as e:
             self.update_progress(0, f"Error: {str(e)}")
             return False
+
+    def process_multi_analysis(self, filter_path, log_path, output_dir, llm_helper, prompts: List[Tuple[str, str]],
+                               parallel=None, chunked=None):
+        """
+        Fan-out: preprocess the log once, then run every (name, prompt) concurrently on
+        the same summary. analysis_completed carries one entry per prompt in `results`
+        (result_html is the first one, for older pages).
+        """
+        try:
+            self.reset_log_parser()
+            self.analysis_result['status'] = 'processing'
+
+            grouped = self.prepare_grouped_log(filter_path, log_path, output_dir, parallel)
+            save_filtered_log_path = os.path.join(output_dir, "filtered_preprocessed.log")
+
+            total = len(prompts)
+            self.update_progress(80, f"Running {total} prompts on the preprocessed log...")
+            results = [None] * total
+            # chunk-level progress of one prompt would jump around, only report whole prompts
+            quiet = lambda percentage, message: None
+
+            def analyze(idx):
+                name, prompt = prompts[idx]
+                llm_result, compaction = self.run_llm_analysis(grouped, llm_helper, prompt, chunked, progress=quiet)
+                return {'name': name, 'result_html': self.render_result(llm_result), 'compaction': compaction}
+
+            with ThreadPoolExecutor(max_workers=min(total, self.MAX_PROMPT_FANOUT)) as executor:
+                futures = {executor.submit(analyze, idx): idx for idx in range(total)}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    idx = futures[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        print(f"Prompt {prompts[idx][0]} failed: {e}")
+                        results[idx] = {'name': prompts[idx][0], 'error': str(e),
+                                        'result_html': f"<p class=\"text-danger\">Analysis failed: {html.escape(str(e))}</p>"}
+                    self.update_progress(85 + int(14 * done / total), f"Prompt {done}/{total} done ({prompts[idx][0]})")
+
+            self.update_progress(100, "Analysis completed!")
+            self.analysis_result['llm_result_html'] = results[0]['result_html']
+            self.analysis_result['log_output_path'] = save_filtered_log_path
+            self.analysis_result['results'] = results
+            app_config.socketio.emit('analysis_completed', {
+                'success': True,
+                'result_html': results[0]['result_html'],
+                'log_output_path': save_filtered_log_path,
+                'results': results
+            }, namespace='/progress')
+            return True
+
+        except Exception as e:
+            self.update_progress(0, f"Error: {str(e)}")
+            return False
         
     def reset_log_parser(self):
         self.progress_status = {
@@ -1,31 +1,230 @@
-import os 
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
 import snowflake.connector
 
-def snowflake_query(passwd, sql_query, schema, fetch_mode="all"):
+
+#---------------- connection pool ---------------
+def _set_proxy_env():
     os.environ["HTTP_PROXY"] = "http://proxy-dmz.intel.com:911"
     os.environ["HTTPS_PROXY"] = "http://proxy-dmz.intel.com:912"
     os.environ["NO_PROXY"] = "xd14286-ecdw.privatelink.snowflakecomputing.com"
 
-    conn = snowflake.connector.connect(
+def _connect(passwd, schema):
+    return snowflake.connector.connect(
         user="SYS_ECDW_WCS_WIRELESSBUGS_DSA_PROD",
         password=passwd,
         role="ROLE_CDA_SALES_SUPPORT_PREMIER_ANALYSIS_READER",
         account = "XD14286-ECDWPROD",
-        warehouse="WH_SMG_CONSUMPTION", 
+        warehouse="WH_SMG_CONSUMPTION",
         database="SALES_MARKETING",
-        schema=schema
+        schema=schema,
+        # keeps the session token alive while the connection sits in the pool
+        client_session_keep_alive=True,
+        # server-side binding (?), so repeated queries reuse the compiled plan
+        paramstyle="qmark"
         )
-    
-    cs = conn.cursor()
-    cs.execute(sql_query)
-
-    if fetch_mode == "all":
-        result = cs.fetchall()
-    elif fetch_mode == "one":
-        result = cs.fetchone()
-    else:
+
+
+class SnowflakeConnectionPool:
+    """
+    Thread-safe pool of authenticated connections for one (password, schema).
+    Idle connections are reused most-recent-first. One that sat idle longer than
+    health_check_sec is pinged before reuse, and idle_timeout_sec closes stale
+    ones. At most max_size connections exist at once; callers wait beyond that.
+    """
+
+    def __init__(self, passwd: str, schema: str, max_size: int = 4, idle_timeout_sec: float = 600,
+                 health_check_sec: float = 60, acquire_timeout_sec: float = 120):
+        self.passwd = passwd
+        self.schema = schema
+        self.max_size = max_size
+        self.idle_timeout_sec = idle_timeout_sec
+        self.health_check_sec = health_check_sec
+        self.acquire_timeout_sec = acquire_timeout_sec
+        self.idle = deque()  # (connection, last_used), most recent on the right
+        self.size = 0
+        self.cond = threading.Condition()
+        self.stats = {'created': 0, 'reused': 0, 'evicted': 0, 'broken': 0}
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"Failed to close Snowflake connection: {e}")
+
+    @staticmethod
+    def _healthy(conn) -> bool:
+        try:
+            if conn.is_closed():
+                return False
+            cs = conn.cursor()
+            try:
+                cs.execute("SELECT 1")
+                cs.fetchone()
+            finally:
+                cs.close()
+            return True
+        except Exception:
+            return False
+
+    def _take_idle(self) -> Optional[Tuple[Any, float]]:
+        """ called under cond: newest idle connection, dropping the expired ones """
+        now = time.time()
+        while self.idle and now - self.idle[0][1] > self.idle_timeout_sec:
+            conn, _ = self.idle.popleft()
+            self.size -= 1
+            self.stats['evicted'] += 1
+            threading.Thread(target=self._close, args=(conn,), daemon=True).start()
+        return self.idle.pop() if self.idle else None
+
+    def acquire(self, check: bool = False):
+        """ check: ping the reused connection even if it was used recently """
+        deadline = time.time() + self.acquire_timeout_sec
+        while True:
+            with self.cond:
+                entry = self._take_idle()
+                if entry is None:
+                    if self.size < self.max_size:
+                        self.size += 1
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or not self.cond.wait(remaining):
+                        raise TimeoutError(f"No Snowflake connection free after {self.acquire_timeout_sec}s")
+                    continue
+
+            conn, last_used = entry
+            if (not check and time.time() - last_used < self.health_check_sec) or self._healthy(conn):
+                with self.cond:
+                    self.stats['reused'] += 1
+                return conn
+            self.discard(conn)
+
+        # a slot is reserved, connect outside the lock
+        try:
+            _set_proxy_env()
+            conn = _connect(self.passwd, self.schema)
+        except Exception:
+            with self.cond:
+                self.size -= 1
+                self.cond.notify()
+            raise
+        with self.cond:
+            self.stats['created'] += 1
+        return conn
+
+    def release(self, conn):
+        with self.cond:
+            self.idle.append((conn, time.time()))
+            self.cond.notify()
+
+    def discard(self, conn):
+        """ drop a broken connection and free its slot """
+        self._close(conn)
+        with self.cond:
+            self.size -= 1
+            self.stats['broken'] += 1
+            self.cond.notify()
+
+    @contextmanager
+    def connection(self, check: bool = False):
+        conn = self.acquire(check)
+        try:
+            yield conn
+        except snowflake.connector.errors.OperationalError:
+            self.discard(conn)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def evict_idle(self):
+        with self.cond:
+            now = time.time()
+            expired = [entry for entry in self.idle if now - entry[1] > self.idle_timeout_sec]
+            for entry in expired:
+                self.idle.remove(entry)
+                self.size -= 1
+                self.stats['evicted'] += 1
+        for conn, _ in expired:
+            self._close(conn)
+
+    def close_all(self):
+        with self.cond:
+            idle = list(self.idle)
+            self.idle.clear()
+            self.size -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.cond:
+            return {'schema': self.schema, 'size': self.size, 'idle': len(self.idle), **self.stats}
+
+
+_pools: Dict[Tuple[str, str], SnowflakeConnectionPool] = {}
+_pools_lock = threading.Lock()
+_reaper_started = False
+REAPER_INTERVAL_SEC = 60
+
+def _reap_idle_connections():
+    while True:
+        time.sleep(REAPER_INTERVAL_SEC)
+        with _pools_lock:
+            pools = list(_pools.values())
+        for pool in pools:
+            pool.evict_idle()
+
+def get_pool(passwd, schema) -> SnowflakeConnectionPool:
+    global _reaper_started
+    with _pools_lock:
+        pool = _pools.get((passwd, schema))
+        if pool is None:
+            pool = _pools[(passwd, schema)] = SnowflakeConnectionPool(passwd, schema)
+        if not _reaper_started:
+            _reaper_started = True
+            threading.Thread(target=_reap_idle_connections, name="snowflake_reaper", daemon=True).start()
+        return pool
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+def pool_stats():
+    with _pools_lock:
+        return [pool.get_stats() for pool in _pools.values()]
+
+
+#---------------- queries ---------------
+def snowflake_query(passwd, sql_query, schema, fetch_mode="all", params=None):
+    if fetch_mode not in ("all", "one"):
         raise ValueError(f"Fetch_mode not supported: {fetch_mode} (current support: all, one)")
-    
-    cs.close()
-    conn.close()
-    return result
\ No newline at end of file
+
+    pool = get_pool(passwd, schema)
+    # a pooled connection can die server-side between health checks, retry once on a fresh one
+    for attempt in range(2):
+        try:
+            with pool.connection(check=attempt > 0) as conn:
+                cs = conn.cursor()
+                try:
+                    cs.execute(sql_query, params)
+                    if fetch_mode == "all":
+                        result = cs.fetchall()
+                    else:
+                        result = cs.fetchone()
+                finally:
+                    cs.close()
+            return result
+        except snowflake.connector.errors.OperationalError as e:
+            if attempt == 1:
+                raise
+            print(f"Snowflake connection lost ({e}), retrying on a new connection")
@@ -0,0 +1,150 @@
+"""
+Local sqlite copy of the Snowflake case rows and IPS comments, keyed by case
+number. A revisit only pulls comments at or after the newest
+CORE_IPS_CREATED_DTM already held; a case synced within fresh_sec is served
+without touching Snowflake at all.
+
+The comment rows have no upstream id, so the sync window is inclusive: the
+cached comments at or after that timestamp are replaced by the fetched ones.
+Identical comments posted at the same time are therefore kept as they are
+upstream instead of being collapsed.
+"""
+import json
+import time
+import sqlite3
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _dtm_to_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else str(value)
+
+def _dtm_from_text(value: Optional[str]) -> Any:
+    """ back to the datetime Snowflake returned, so cached and fresh comments look the same """
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return value
+
+
+@dataclass
+class CachedCase:
+    case_nbr: str
+    case_fields: Tuple  # (case_id, subject, env_detail, description, backend_id, subcategory)
+    comments: List[list]  # raw [created, author_type, text] rows, oldest first
+    synced: float
+
+    @property
+    def latest_comment_dtm(self) -> Any:
+        return self.comments[-1][0] if self.comments else None
+
+
+class CaseCache:
+
+    def __init__(self, db_path: str, fresh_sec: float = 120, max_cases: int = 500):
+        self.db_path = db_path
+        self.fresh_sec = fresh_sec
+        self.max_cases = max_cases
+        self.hits = 0
+        self.syncs = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS cases (
+                    case_nbr TEXT PRIMARY KEY,
+                    case_id TEXT,
+                    subject TEXT,
+                    env_detail TEXT,
+                    description TEXT,
+                    backend_id TEXT,
+                    subcategory TEXT,
+                    synced REAL,
+                    accessed REAL
+                )""")
+            # the first version deduped on (created, author, text) and collapsed identical comments
+            self.conn.execute("DROP TABLE IF EXISTS comments")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_comments (
+                    case_nbr TEXT,
+                    created TEXT,
+                    author_type TEXT,
+                    comment TEXT
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS case_comments_created ON case_comments (case_nbr, created)")
+
+    def is_fresh(self, cached: CachedCase) -> bool:
+        return time.time() - cached.synced < self.fresh_sec
+
+    def get(self, case_nbr: str) -> Optional[CachedCase]:
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT case_id, subject, env_detail, description, backend_id, subcategory, synced "
+                                    "FROM cases WHERE case_nbr = ?", (case_nbr,)).fetchone()
+            if row is None:
+                return None
+            comments = self.conn.execute("SELECT created, author_type, comment FROM case_comments "
+                                         "WHERE case_nbr = ? ORDER BY created, rowid", (case_nbr,)).fetchall()
+            self.conn.execute("UPDATE cases SET accessed = ? WHERE case_nbr = ?", (time.time(), case_nbr))
+        case_id, subject, env_detail, description, backend_id, subcategory, synced = row
+        case_fields = (case_id, subject, json.loads(env_detail) if env_detail else {}, description,
+                       backend_id, subcategory)
+        return CachedCase(case_nbr, case_fields,
+                          [[_dtm_from_text(created), author, text] for created, author, text in comments], synced)
+
+    def save(self, case_nbr: str, case_fields: Tuple, comments: List, since: Any = None) -> int:
+        """
+        Upsert the case row and store the fetched comments, which replace the cached
+        ones created at or after `since` (all of them when since is None).
+        Returns how many comments were new.
+        """
+        now = time.time()
+        case_id, subject, env_detail, description, backend_id, subcategory = case_fields
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO cases (case_nbr, case_id, subject, env_detail, description, "
+                              "backend_id, subcategory, synced, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (case_nbr, case_id, subject, json.dumps(env_detail or {}, ensure_ascii=False),
+                               description, backend_id, subcategory, now, now))
+            if since is None:
+                replaced = self.conn.execute("DELETE FROM case_comments WHERE case_nbr = ?", (case_nbr,)).rowcount
+            else:
+                replaced = self.conn.execute("DELETE FROM case_comments WHERE case_nbr = ? AND created >= ?",
+                                             (case_nbr, _dtm_to_text(since))).rowcount
+            self.conn.executemany("INSERT INTO case_comments (case_nbr, created, author_type, comment) "
+                                  "VALUES (?, ?, ?, ?)",
+                                  [(case_nbr, _dtm_to_text(c[0]), c[1], c[2]) for c in comments])
+            self._evict()
+            self.syncs += 1
+        return max(len(comments) - replaced, 0)
+
+    def mark_hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def _evict(self):
+        """ called under lock: drop the least recently opened cases past max_cases """
+        stale = self.conn.execute("SELECT case_nbr FROM cases ORDER BY accessed DESC LIMIT -1 OFFSET ?",
+                                  (self.max_cases,)).fetchall()
+        for (case_nbr,) in stale:
+            self.conn.execute("DELETE FROM case_comments WHERE case_nbr = ?", (case_nbr,))
+            self.conn.execute("DELETE FROM cases WHERE case_nbr = ?", (case_nbr,))
+
+    def invalidate(self, case_nbr: Optional[str] = None):
+        with self.lock, self.conn:
+            if case_nbr is None:
+                self.conn.execute("DELETE FROM case_comments")
+                self.conn.execute("DELETE FROM cases")
+            else:
+                self.conn.execute("DELETE FROM case_comments WHERE case_nbr = ?", (case_nbr,))
+                self.conn.execute("DELETE FROM cases WHERE case_nbr = ?", (case_nbr,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            cases = self.conn.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+            comments = self.conn.execute("SELECT COUNT(*) FROM case_comments").fetchone()[0]
+            return {"cases": cases, "comments": comments, "hits": self.hits, "syncs": self.syncs}
@@ -0,0 +1,158 @@
+"""
+Compact text rendering of a CaseContext for LLM prompts.
+
+Only triage fields are kept. Local paths, the attachment list and the backend
+ids are dropped. Quoted e-mail history and repeated comments are removed,
+URLs are shortened, and each field is capped so the whole case fits in a
+token budget. The description and the latest comments are kept first.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+from utils.token_counter import count_tokens
+
+
+# per-field character caps, applied before the token budget
+MAX_SUBJECT_CHARS = 300
+MAX_ENV_VALUE_CHARS = 200
+MAX_DESCRIPTION_CHARS = 6000
+MAX_COMMENT_CHARS = 1500
+# share of the budget the description may take before comments are considered
+DESCRIPTION_BUDGET_SHARE = 0.5
+
+# start of quoted reply history; comments are flattened to one line, so match anywhere
+QUOTE_PATTERN = re.compile(
+    r"-{2,}\s*Original Message\s*-{2,}|\bFrom:\s.{1,200}?\bSent:\s|\bOn\s.{1,120}?\swrote:",
+    re.IGNORECASE)
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>]+", re.IGNORECASE)
+HTML_TAG_PATTERN = re.compile(r"<[^>]{1,200}>")
+BLANK_LINES_PATTERN = re.compile(r"\n\s*\n+")
+SPACES_PATTERN = re.compile(r"[ \t\xa0]+")
+# "name \xa0 \xa0 link" in attachment notices (the nbsp may already be spaces)
+ATTACHMENT_SEPARATOR = re.compile(r"\s*\xa0[\s\xa0]*|\s{3,}")
+
+
+def _clip(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + " ...[truncated]"
+
+def _shorten_url(match: re.Match) -> str:
+    url = match.group(0)
+    host = url.split("/")[2] if url.count("/") >= 2 else url
+    return f"<link:{host}>"
+
+def clean_text(text: Any) -> str:
+    """ plain text with html tags dropped, urls shortened and whitespace collapsed """
+    if text is None:
+        return ""
+    text = str(text)
+    if "<" in text:
+        text = HTML_TAG_PATTERN.sub(" ", text)
+    text = URL_PATTERN.sub(_shorten_url, text)
+    text = SPACES_PATTERN.sub(" ", text)
+    text = BLANK_LINES_PATTERN.sub("\n", text)
+    return text.strip()
+
+def strip_quoted_history(text: str) -> str:
+    match = QUOTE_PATTERN.search(text)
+    if match and match.start() > 0:
+        return text[:match.start()].rstrip()
+    return text
+
+def _comment_parts(comment) -> Tuple[str, str, str]:
+    """ (created, author_type, text) from a [created, author_type, text] row or a plain string """
+    if isinstance(comment, (list, tuple)):
+        if len(comment) >= 3:
+            return str(comment[0] or "")[:16], str(comment[1] or ""), str(comment[2] or "")
+        return "", "", str(comment[-1]) if comment else ""
+    return "", "", str(comment)
+
+def compact_comments(comments) -> List[str]:
+    """ one line per distinct comment, oldest first, quoted history and attachment notices reduced """
+    if not comments:
+        return []
+    if isinstance(comments, str):
+        # PDF fallback joins the comments with blank lines; split them back so each gets its own cap
+        comments = [part for part in BLANK_LINES_PATTERN.split(comments) if part.strip()]
+
+    lines, seen = [], set()
+    for comment in comments:
+        created, author, text = _comment_parts(comment)
+        if "Download link" in text:
+            # attachment notice: the file name is all that matters for triage
+            fields = ATTACHMENT_SEPARATOR.split(text.strip())
+            name = fields[-2] if len(fields) >= 2 else "file"
+            text = f"[attachment uploaded: {clean_text(name)}]"
+        else:
+            text = strip_quoted_history(clean_text(text))
+        if not text:
+            continue
+        # exact repeats only, a short comment ("Rebooted") can be new history even if a longer one contains it
+        key = " ".join(text.lower().split())
+        if key in seen:
+            continue
+        seen.add(key)
+        prefix = " ".join(part for part in (created, author) if part)
+        lines.append(f"[{prefix}] {_clip(text, MAX_COMMENT_CHARS)}" if prefix else _clip(text, MAX_COMMENT_CHARS))
+    return lines
+
+def _as_dict(case_context) -> Dict[str, Any]:
+    if isinstance(case_context, dict):
+        return case_context
+    if hasattr(case_context, "to_dict"):
+        return case_context.to_dict()
+    return {"description": str(case_context)}
+
+def _fit_tokens(text: str, budget: int, model: str) -> str:
+    """ cut text down to roughly `budget` tokens """
+    tokens = count_tokens(text, model)
+    if tokens <= budget:
+        return text
+    return _clip(text, max(int(len(text) * budget / tokens) - 20, 0))
+
+def serialize_case_context(case_context, budget: int = 4000, model: str = "gpt-4.1") -> str:
+    """
+    Prompt text for a CaseContext (or its session dict) of at most ~`budget`
+    tokens: header fields, environment, description, then as many of the
+    latest comments as fit, in time order.
+    """
+    case = _as_dict(case_context)
+
+    header = []
+    for label, key in (("Case", "case_nbr"), ("Subject", "subject"), ("Subcategory", "subcategory"),
+                       ("Product", "wifi_or_bt")):
+        value = clean_text(case.get(key))
+        if value:
+            header.append(f"{label}: {_clip(value, MAX_SUBJECT_CHARS)}")
+    env_detail = case.get("env_detail") or {}
+    if isinstance(env_detail, dict) and env_detail:
+        header.append("Environment:")
+        header.extend(f"- {clean_text(k)}: {_clip(clean_text(v), MAX_ENV_VALUE_CHARS)}"
+                      for k, v in env_detail.items() if clean_text(v))
+    elif env_detail:
+        header.append(f"Environment: {_clip(clean_text(env_detail), MAX_ENV_VALUE_CHARS * 4)}")
+    header_text = "\n".join(header)
+    remaining = budget - count_tokens(header_text, model)
+
+    description = _clip(clean_text(case.get("description")), MAX_DESCRIPTION_CHARS)
+    description = _fit_tokens(description, int(max(remaining, 0) * DESCRIPTION_BUDGET_SHARE), model)
+    remaining -= count_tokens(description, model)
+
+    comments = compact_comments(case.get("comments"))
+    kept: List[str] = []
+    for line in reversed(comments):
+        cost = count_tokens(line, model) + 1
+        if cost > remaining:
+            break
+        kept.append(line)
+        remaining -= cost
+    kept.reverse()
+
+    parts = [header_text, f"Description:\n{description or '(none)'}"]
+    if comments:
+        omitted = len(comments) - len(kept)
+        title = f"Comments (oldest first, {len(kept)} of {len(comments)}"
+        title += f", {omitted} earlier omitted):" if omitted else "):"
+        parts.append("\n".join([title] + kept))
+    return "\n\n".join(part for part in parts if part)
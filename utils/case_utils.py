@@ -1,61 +1,136 @@
 import os
 import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs, unquote
 import fitz
 from models.models import CaseContext
 
+
+#---------------- IPS PDF extraction ---------------
+# bump when the extracted structure changes, older sidecar files are then ignored
+PDF_EXTRACT_VERSION = 1
+PDF_EXTRACT_MEMORY_ENTRIES = 32
+
+@dataclass
+class PdfExtract:
+    sha256: str
+    pages: List[List[float]] = field(default_factory=list)  # [width, height] per page
+    links: List[Dict[str, Any]] = field(default_factory=list)  # {"page", "uri", "rect"}, uri links only
+    blocks: List[Dict[str, Any]] = field(default_factory=list)  # {"page", "bbox", "text"}, top-to-bottom per page
+
+_pdf_extracts: "OrderedDict[str, PdfExtract]" = OrderedDict()
+_pdf_extracts_lock = threading.Lock()
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _extract_sidecar_path(pdf_path):
+    return os.path.join(os.path.dirname(pdf_path), f".{os.path.basename(pdf_path)}.extract.json")
+
+def _read_pdf(pdf_path, sha256):
+    """ links, text blocks and page sizes in one walk over the document """
+    extract = PdfExtract(sha256=sha256)
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            page_nbr = page.number + 1
+            extract.pages.append([page.rect.width, page.rect.height])
+            for link in page.get_links():
+                uri = link.get('uri')
+                if uri:
+                    extract.links.append({"page": page_nbr, "uri": uri, "rect": list(link["from"])})
+            blocks = page.get_text("blocks")
+            blocks.sort(key=lambda b: (b[1], b[0]))  # sort top-to-bottom, left-to-right
+            for b in blocks:
+                text = b[4].strip()
+                if text:
+                    extract.blocks.append({"page": page_nbr, "bbox": list(b[:4]), "text": text})
+    return extract
+
+def extract_pdf(pdf_path) -> PdfExtract:
+    """
+    PdfExtract of an IPS export, cached by content hash: in memory for the
+    latest PDFs, and in a sidecar json next to the PDF across restarts.
+    """
+    sha256 = _file_sha256(pdf_path)
+    with _pdf_extracts_lock:
+        extract = _pdf_extracts.get(sha256)
+        if extract is not None:
+            _pdf_extracts.move_to_end(sha256)
+            return extract
+
+    sidecar_path = _extract_sidecar_path(pdf_path)
+    extract = None
+    try:
+        with open(sidecar_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == PDF_EXTRACT_VERSION and data.get("sha256") == sha256:
+            extract = PdfExtract(sha256, data["pages"], data["links"], data["blocks"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if extract is None:
+        extract = _read_pdf(pdf_path, sha256)
+        try:
+            with open(sidecar_path, "w", encoding="utf-8") as f:
+                json.dump({"version": PDF_EXTRACT_VERSION, **asdict(extract)}, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"⚠️ Failed to write PDF extract cache: {e}")
+    else:
+        print(f"(pdf cache) reuse extract of {os.path.basename(pdf_path)}")
+
+    with _pdf_extracts_lock:
+        _pdf_extracts[sha256] = extract
+        while len(_pdf_extracts) > PDF_EXTRACT_MEMORY_ENTRIES:
+            _pdf_extracts.popitem(last=False)
+    return extract
+
+
 def parse_pdf_for_attachments(downloaded_pdf_path, att_name_desc):
-    doc = fitz.open(downloaded_pdf_path)
+    extract = extract_pdf(downloaded_pdf_path)
     att_links = []
 
     filename_count = {}  
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        links = page.get_links()
-        for link in links:
-            uri = link.get('uri', '')
-            if "https://esft.intel.com/sftservices/download" in uri:
-                parsed_url = urlparse(uri)
-                query_params = parse_qs(parsed_url.query)
-                filename = unquote(query_params.get('FileName', [''])[0])
-
-                if filename in filename_count:
-                    filename_count[filename] += 1
-                    base, ext = os.path.splitext(filename)
-                    numbered_filename = f"{base}_{filename_count[filename]}{ext}"
-                else:
-                    filename_count[filename] = 1
-                    numbered_filename = filename
-                
-                desc = att_name_desc.get(filename)      
-                print("📦 uri filename:", numbered_filename)
-                if desc is None:
-                    print(f"⚠️ File name in the PDF has no matching description: '{filename}'")
-                    desc = [None, "(No description)"]
-
-                att_links.append([numbered_filename, uri, desc])
+    for link in extract.links:
+        uri = link['uri']
+        if "https://esft.intel.com/sftservices/download" in uri:
+            parsed_url = urlparse(uri)
+            query_params = parse_qs(parsed_url.query)
+            filename = unquote(query_params.get('FileName', [''])[0])
+
+            if filename in filename_count:
+                filename_count[filename] += 1
+                base, ext = os.path.splitext(filename)
+                numbered_filename = f"{base}_{filename_count[filename]}{ext}"
+            else:
+                filename_count[filename] = 1
+                numbered_filename = filename
+            
+            desc = att_name_desc.get(filename)      
+            print("📦 uri filename:", numbered_filename)
+            if desc is None:
+                print(f"⚠️ File name in the PDF has no matching description: '{filename}'")
+                desc = [None, "(No description)"]
+
+            att_links.append([numbered_filename, uri, desc])
 
     return att_links
 
 def parse_pdf_for_all_info(ips_pdf_path, case_context: CaseContext):
-    doc = fitz.open(ips_pdf_path)
-    print("-----doc-----", doc)
-    print("-----len(doc)-----", len(doc))
+    extract = extract_pdf(ips_pdf_path)
+    print("-----len(doc)-----", len(extract.pages))
     
-    all_blocks = []
-    for page in doc:
-        blocks = page.get_text("blocks")
-        blocks.sort(key=lambda b: (b[1], b[0]))  # sort top-to-bottom, left-to-right
-        for b in blocks:
-            text = b[4].strip()
-            if text:
-                all_blocks.append({
-                    "page": page.number + 1,
-                    "bbox": b[:4],
-                    "text": text
-                })
+    all_blocks = extract.blocks
 
     recent_comments = []
 
@@ -2,12 +2,13 @@ import socket
 import random
 import winreg
 import os, re
+import mmap
 import subprocess
 import importlib
 import pyperclip
 import threading
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 def get_available_port(start=54000, end=60000, max_tries=20):
     for _ in range(max_tries):
@@ -37,15 +38,29 @@ def init_download_dir():
     return downloads_dir, driver_dir, prompt_dir
 
 
+CASE_NUMBER_PATTERN = re.compile(r"^\d{8}$")
+
 def get_clipboard_case_number():
     text = pyperclip.paste()
     text = text.strip().replace(" ", "")  # 
 
-    pattern = r"^\d{8}$"  # 
-    if not text or not re.match(pattern, text):
+    if not text or not CASE_NUMBER_PATTERN.match(text):
         text = ""
     return text.strip()
 
+def parse_case_numbers(text: str) -> Tuple[List[str], List[str]]:
+    """
+    8-digit case numbers separated by newlines, commas or spaces, duplicates dropped in order.
+    Returns (case_nbrs, rejected), rejected being the tokens that are not case numbers (csv headers etc.)
+    """
+    seen, case_nbrs, rejected = set(), [], []
+    for token in re.split(r"[\s,;]+", text):
+        if not token or token in seen:
+            continue
+        seen.add(token)
+        (case_nbrs if CASE_NUMBER_PATTERN.match(token) else rejected).append(token)
+    return case_nbrs, rejected
+
 def detect_user_email():
     try:
         result = subprocess.run(['whoami', '/upn'], capture_output=True, text=True, check=True)
@@ -76,13 +91,40 @@ def get_load_path(primary, backup, timeout_sec=8):
     print("!! ALL SHARED FOLDER UNAVAILABLE")
 
 
-def read_log_file(path: str) -> List[str]:
+def iter_log_file_mmap(path: str, pattern: Optional[re.Pattern] = None,
+                       start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """
+    Memory-mapped log reader. `pattern` is a bytes regex searched on the raw
+    file; only lines containing a match are decoded and yielded, the rest of
+    the log never becomes Python str objects. Without a pattern every line in
+    [start, end) is yielded. Newlines are normalized like text mode.
+    """
     try:
-        with open(path, 'r', encoding='utf-8', errors="replace") as f:
-            return f.readlines()
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = len(mm) if end is None else min(end, len(mm))
+                pos = start
+                while pos < end:
+                    if pattern is not None:
+                        match = pattern.search(mm, pos, end)
+                        if match is None:
+                            break
+                        line_start = mm.rfind(b'\n', pos, match.start()) + 1 or pos
+                        line_end = mm.find(b'\n', match.end(), end)
+                    else:
+                        line_start = pos
+                        line_end = mm.find(b'\n', pos, end)
+                    line_end = end if line_end == -1 else line_end + 1
+
+                    line = mm[line_start:line_end].decode('utf-8', errors="replace")
+                    if line.endswith('\r\n'):
+                        line = line[:-2] + '\n'
+                    yield line
+                    pos = line_end
     except Exception as e:
         print(f"Error reading file {path}: {e}")
-        return []
 
 def save_file(output_path: str, lines, ensure_newline: bool = False):
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -92,4 +134,15 @@ def save_file(output_path: str, lines, ensure_newline: bool = False):
                 line_str += '\n'
             
             f.write(line_str)
-    print(f"save to: {output_path}")
\ No newline at end of file
+    print(f"save to: {output_path}")
+
+def tee_to_file(output_path: str, lines: Iterable, ensure_newline: bool = False) -> Iterator:
+    """ like save_file, but passes every line through so a pipeline can keep streaming """
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            line_str = str(line)
+            if ensure_newline and not line_str.endswith('\n'):
+                line_str += '\n'
+            f.write(line_str)
+            yield line
+    print(f"save to: {output_path}")
@@ -0,0 +1,136 @@
+"""
+Local rule-based issue classifier, run before classify_issue spends an LLM call.
+
+Each category has weighted regex indicators (the same ones listed in the
+classify prompt). All of them are compiled into one alternation, so a field is
+scanned once. Hits are weighted by where they occur (subject > description >
+comments). Confidence is high only when one category clearly dominates.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+UNCLASSIFIED = "Unclassified"
+
+
+@dataclass(frozen=True)
+class IssueRule:
+    issue_type: str
+    pattern: str
+    weight: float
+
+
+ISSUE_RULES: Tuple[IssueRule, ...] = (
+    IssueRule("BSOD", r"\bbsod\b|blue ?screen", 3),
+    IssueRule("BSOD", r"bug ?check|stop code|\.dmp\b|\b(?:mini|memory|kernel) ?dump\b", 2),
+    IssueRule("BSOD", r"system crash|\bcrash(?:ed|es)?\b", 1),
+    IssueRule("Yellow Bang (YB)", r"\byb\b|yellow ?bang", 3),
+    IssueRule("Yellow Bang (YB)", r"device (?:lost|drop(?:ped)?|missing|disappear(?:ed|s)?)|code ?(?:10|43)\b", 2),
+    IssueRule("Yellow Bang (YB)", r"not (?:detected|shown|present) in device manager|adapter (?:missing|disappear)", 2),
+    IssueRule("Connectivity", r"dma ?remapping", 3),
+    IssueRule("Connectivity", r"disconnect(?:s|ed|ion)?\b|(?:cannot|can't|unable to|fail(?:ed|s)? to) connect", 2),
+    IssueRule("Connectivity", r"no internet|limited connectivity|connection (?:drop|lost|loss|issue)", 2),
+    IssueRule("Connectivity", r"packet loss|ping loss|low throughput", 1),
+    IssueRule("PPAG", r"\bppag\b", 3),
+    IssueRule("MLO", r"\bmlo\b|multi-?link", 3),
+    IssueRule("Assert", r"\bassert(?:ion)?s?\b", 3),
+    IssueRule("Assert", r"firmware (?:crash|error)|\bfw (?:crash|error)\b", 1),
+    IssueRule("WRDS/WGDS/EWRD/SGOM", r"\b(?:wrds|wgds|ewrd|sgom)\b", 3),
+    IssueRule("TAS", r"\btas\b|time[- ]average(?:d)? sar", 3),
+    IssueRule("Roaming", r"\broam(?:ing|s|ed)?\b", 3),
+    IssueRule("P2P", r"\bp2p\b|peer[- ]to[- ]peer|wi-?fi direct|miracast", 3),
+    IssueRule("DSM", r"\bdsm\b", 3),
+    IssueRule("VLP/UHB/AFC", r"\b(?:vlp|uhb|afc)\b", 3),
+    IssueRule("VLP/UHB/AFC", r"function ?3\b|\b6 ?ghz\b", 2),
+    IssueRule("UATS", r"\buats\b", 3),
+)
+
+# subject is short and written to name the problem, comments are long and wander
+FIELD_WEIGHTS = {"subject": 2.0, "description": 1.0, "comments": 0.5}
+# repeats of the same indicator in one field stop adding after this many
+MAX_HITS_PER_RULE = 3
+# score at which a lone category is fully trusted (one strong hit in the subject)
+SATURATION_SCORE = 6.0
+
+
+class IssueClassifier:
+
+    def __init__(self, rules: Iterable[IssueRule] = ISSUE_RULES, categories: Optional[Iterable[str]] = None):
+        allowed = set(categories) if categories is not None else None
+        self.rules = [rule for rule in rules if allowed is None or rule.issue_type in allowed]
+        self.pattern = re.compile("|".join(f"(?P<r{idx}>{rule.pattern})" for idx, rule in enumerate(self.rules)),
+                                  re.IGNORECASE) if self.rules else None
+
+    def score(self, fields: Dict[str, str]) -> Tuple[Dict[str, float], Dict[str, List[str]]]:
+        scores: Dict[str, float] = {}
+        keywords: Dict[str, List[str]] = {}
+        if self.pattern is None:
+            return scores, keywords
+        for name, text in fields.items():
+            if not text:
+                continue
+            hits: Dict[int, int] = {}
+            for match in self.pattern.finditer(text):
+                idx = int(match.lastgroup[1:])
+                hits[idx] = hits.get(idx, 0) + 1
+                rule = self.rules[idx]
+                found = keywords.setdefault(rule.issue_type, [])
+                keyword = match.group(0).lower()
+                if keyword not in found:
+                    found.append(keyword)
+            for idx, count in hits.items():
+                rule = self.rules[idx]
+                scores[rule.issue_type] = (scores.get(rule.issue_type, 0.0)
+                                           + rule.weight * FIELD_WEIGHTS.get(name, 1.0) * min(count, MAX_HITS_PER_RULE))
+        return scores, keywords
+
+    def classify(self, case_context) -> Dict[str, Any]:
+        """ same shape as the classify_issue tool call: issue_type, confidence, keywords_found """
+        scores, keywords = self.score(case_fields(case_context))
+        if not scores:
+            return {"issue_type": UNCLASSIFIED, "confidence": 0, "keywords_found": [], "source": "rules"}
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        issue_type, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = (best / (best + runner_up)) * min(1.0, best / SATURATION_SCORE)
+        return {
+            "issue_type": issue_type,
+            "confidence": round(confidence, 2),
+            "keywords_found": keywords.get(issue_type, []),
+            "source": "rules",
+        }
+
+
+def _comments_text(comments) -> str:
+    """ comments are a string or a list of [created, author_type, text] rows (or plain strings) """
+    if not comments:
+        return ""
+    if isinstance(comments, str):
+        return comments
+    parts = []
+    for comment in comments:
+        if isinstance(comment, (list, tuple)):
+            parts.append(str(comment[-1]) if comment else "")
+        else:
+            parts.append(str(comment))
+    return "\n".join(parts)
+
+def case_fields(case_context) -> Dict[str, str]:
+    """ subject/description/comments text from a CaseContext or its session dict """
+    if not isinstance(case_context, dict):
+        case_context = case_context.to_dict() if hasattr(case_context, "to_dict") else {"description": str(case_context)}
+    return {
+        "subject": str(case_context.get("subject") or ""),
+        "description": str(case_context.get("description") or ""),
+        "comments": _comments_text(case_context.get("comments")),
+    }
+
+@lru_cache(maxsize=8)
+def get_issue_classifier(categories: Optional[Tuple[str, ...]] = None) -> IssueClassifier:
+    return IssueClassifier(categories=categories)
+
+def classify_issue_locally(case_context, categories: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    return get_issue_classifier(tuple(categories) if categories is not None else None).classify(case_context)
@@ -0,0 +1,100 @@
+"""
+Disk-backed cache for LLM completions (classify_issue / analyze_desc).
+Entries live in a small sqlite file, expire after a TTL and the least
+recently used ones are evicted past max_entries.
+"""
+import json
+import time
+import sqlite3
+import hashlib
+import datetime
+import threading
+from typing import Any, Dict
+
+
+# local paths/state that differ between runs but do not change the case itself
+VOLATILE_CASE_FIELDS = ("case_download_dir", "ips_pdf_path", "error_message")
+
+
+def _json_default(value):
+    # comment timestamps come back from the Flask session as second-precision UTC datetimes,
+    # normalize so a case warmed outside a request hits the same key as the session copy
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=0).isoformat(sep=" ")
+    return str(value)
+
+def normalize_case_context(case_context) -> str:
+    if isinstance(case_context, dict):
+        case_context = {k: v for k, v in case_context.items() if k not in VOLATILE_CASE_FIELDS}
+    return json.dumps(case_context, sort_keys=True, ensure_ascii=False, default=_json_default)
+
+def make_cache_key(kind: str, model: str, prompt: str, case_context) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    digest = hashlib.sha256()
+    for part in (kind, model or "", prompt_hash, normalize_case_context(case_context)):
+        digest.update(part.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+
+    def __init__(self, db_path: str, ttl_sec: float = 7 * 24 * 3600, max_entries: int = 2000):
+        self.db_path = db_path
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT,
+                    value TEXT,
+                    created REAL,
+                    accessed REAL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_sec:
+                if row is not None:
+                    self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return default
+            self.conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, kind: str = ""):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO llm_cache (key, kind, value, created, accessed) "
+                              "VALUES (?, ?, ?, ?, ?)",
+                              (key, kind, json.dumps(value, ensure_ascii=False), now, now))
+            self.conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_sec,))
+            self.conn.execute("DELETE FROM llm_cache WHERE key NOT IN "
+                              "(SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT ?)", (self.max_entries,))
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "entries": entries,
+            "ttl_sec": self.ttl_sec,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,116 @@
+"""
+Per-call LLM telemetry (tokens, latency, finish_reason, cache hits) in a small
+sqlite file, summarized with totals and percentiles for /llm/telemetry.
+"""
+import math
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """ nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class LLMTelemetry:
+
+    def __init__(self, db_path: str, max_rows: int = 50000):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.inserts = 0
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL,
+                    caller TEXT,
+                    model TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    latency_ms REAL,
+                    finish_reason TEXT,
+                    cache_hit INTEGER,
+                    streamed INTEGER,
+                    estimated INTEGER,
+                    error TEXT
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS llm_calls_ts ON llm_calls (ts)")
+
+    def record(self, caller: str, model: Optional[str] = None, prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency_ms: float = 0.0, finish_reason: Optional[str] = None, cache_hit: bool = False,
+               streamed: bool = False, estimated: bool = False, error: Optional[str] = None):
+        """ estimated: token counts came from the local tokenizer (streamed calls report no usage) """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO llm_calls (ts, caller, model, prompt_tokens, completion_tokens, latency_ms, "
+                    "finish_reason, cache_hit, streamed, estimated, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), caller, model, prompt_tokens or 0, completion_tokens or 0, latency_ms,
+                     finish_reason, int(cache_hit), int(streamed), int(estimated), error))
+                self.inserts += 1
+                if self.inserts % 1000 == 0:
+                    self.conn.execute("DELETE FROM llm_calls WHERE id <= "
+                                      "(SELECT MAX(id) FROM llm_calls) - ?", (self.max_rows,))
+        except sqlite3.Error as e:
+            print(f"Failed to record LLM telemetry: {e}")
+
+    def _rows(self, since: Optional[float], caller: Optional[str]) -> List[tuple]:
+        query = ("SELECT caller, model, prompt_tokens, completion_tokens, latency_ms, finish_reason, "
+                 "cache_hit, estimated, error FROM llm_calls WHERE ts >= ?")
+        params: List[Any] = [since or 0]
+        if caller:
+            query += " AND caller = ?"
+            params.append(caller)
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    @staticmethod
+    def _summarize(rows) -> Dict[str, Any]:
+        calls = [row for row in rows if not row[6]]
+        ok = [row for row in calls if not row[8]]
+        latencies = sorted(row[4] for row in ok)
+        prompt_tokens = sorted(row[2] for row in ok)
+        completion_tokens = sorted(row[3] for row in ok)
+        finish_reasons: Dict[str, int] = {}
+        for row in ok:
+            finish_reasons[row[5] or "unknown"] = finish_reasons.get(row[5] or "unknown", 0) + 1
+        return {
+            "requests": len(rows),
+            "llm_calls": len(calls),
+            "cache_hits": len(rows) - len(calls),
+            "cache_hit_rate": round((len(rows) - len(calls)) / len(rows), 3) if rows else 0,
+            "errors": len(calls) - len(ok),
+            "estimated_token_calls": sum(1 for row in ok if row[7]),
+            "prompt_tokens_total": sum(prompt_tokens),
+            "completion_tokens_total": sum(completion_tokens),
+            "latency_ms": {f"p{p}": percentile(latencies, p) for p in (50, 90, 95, 99)},
+            "latency_ms_max": latencies[-1] if latencies else None,
+            "prompt_tokens": {f"p{p}": percentile(prompt_tokens, p) for p in (50, 95)},
+            "completion_tokens": {f"p{p}": percentile(completion_tokens, p) for p in (50, 95)},
+            "finish_reasons": finish_reasons,
+        }
+
+    def summary(self, since: Optional[float] = None, caller: Optional[str] = None) -> Dict[str, Any]:
+        """ totals and percentiles overall and per caller, for calls at or after `since` (epoch seconds) """
+        rows = self._rows(since, caller)
+        by_caller: Dict[str, list] = {}
+        for row in rows:
+            by_caller.setdefault(row[0], []).append(row)
+        return {
+            "since": since,
+            "total": self._summarize(rows),
+            "by_caller": {name: self._summarize(caller_rows) for name, caller_rows in sorted(by_caller.items())},
+        }
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self.lock:
+            cursor = self.conn.execute("SELECT * FROM llm_calls ORDER BY id DESC LIMIT ?", (limit,))
+            names = [col[0] for col in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
@@ -0,0 +1,103 @@
+"""
+Token-budget compaction of the mined log summary before it is sent to the LLM.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+from utils.token_counter import count_tokens_per_line
+
+
+# lines worth keeping whole when the log does not fit
+PRIORITY_PATTERN = re.compile(
+    r"error|fail|assert|disconnect|deauth|disassoc|timeout|timed out|fatal|exception|crash|bsod|abort|reset",
+    re.IGNORECASE)
+# template lines from LogTemplateMiner.to_lines
+REPETITIVE_PATTERN = re.compile(r"^\[T\d+ x\d+")
+
+# tiers in keep order
+TIER_PRIORITY, TIER_SINGLE, TIER_REPETITIVE = "priority", "single", "repetitive"
+_TIERS = (TIER_PRIORITY, TIER_SINGLE, TIER_REPETITIVE)
+
+# reserved for the trailing "dropped" note
+_NOTE_TOKENS = 40
+
+
+def _tier(line: str) -> str:
+    if PRIORITY_PATTERN.search(line):
+        return TIER_PRIORITY
+    if REPETITIVE_PATTERN.match(line):
+        return TIER_REPETITIVE
+    return TIER_SINGLE
+
+def _sample_evenly(indices: List[int], costs: List[int], budget: int) -> List[int]:
+    """ pick indices spread evenly over the list whose costs fit in budget """
+    if not indices or budget <= 0:
+        return []
+    total = sum(costs[i] for i in indices)
+    if total <= budget:
+        return indices
+    stride = total / budget
+    picked, used, next_at, running = [], 0, 0.0, 0
+    for i in indices:
+        if running >= next_at and used + costs[i] <= budget:
+            picked.append(i)
+            used += costs[i]
+            next_at += stride * costs[i]
+        running += costs[i]
+    return picked
+
+def compact_log_lines(lines: List[str], budget: int, model: str = "gpt-4.1") -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Keep `lines` under `budget` tokens. Error/assert/disconnect lines are kept
+    first, then single lines, then repetitive templates, each tier sampled
+    evenly over time when it does not fit. Returns the kept lines (original
+    order, plus a note when something was dropped) and a report.
+    """
+    costs = count_tokens_per_line(lines, model)
+    tokens_before = sum(costs)
+    report = {
+        "budget": budget,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_before,
+        "lines_before": len(lines),
+        "lines_after": len(lines),
+        "dropped": {tier: 0 for tier in _TIERS},
+    }
+    if tokens_before <= budget:
+        return lines, report
+
+    by_tier = {tier: [] for tier in _TIERS}
+    for idx, line in enumerate(lines):
+        by_tier[_tier(line)].append(idx)
+
+    remaining = budget - _NOTE_TOKENS
+    kept = []
+    for tier in _TIERS:
+        picked = _sample_evenly(by_tier[tier], costs, remaining)
+        remaining -= sum(costs[i] for i in picked)
+        report["dropped"][tier] = len(by_tier[tier]) - len(picked)
+        kept.extend(picked)
+
+    kept.sort()
+    compacted = [lines[i] for i in kept]
+    dropped = len(lines) - len(kept)
+    compacted.append(f"... ({dropped} of {len(lines)} lines dropped to fit the {budget} token budget: "
+                     + ", ".join(f"{n} {tier}" for tier, n in report["dropped"].items() if n) + ") ...")
+
+    report["tokens_after"] = sum(costs[i] for i in kept) + _NOTE_TOKENS
+    report["lines_after"] = len(kept)
+    return compacted, report
+
+def split_log_lines(lines: List[str], budget: int, model: str = "gpt-4.1") -> List[List[str]]:
+    """ split lines, in order, into consecutive windows of at most `budget` tokens """
+    costs = count_tokens_per_line(lines, model)
+    chunks, current, used = [], [], 0
+    for line, cost in zip(lines, costs):
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,112 @@
+"""
+Micro benchmarks for the log parser preprocessing stages.
+
+    python -m utils.log_parser_bench            # 1M synthetic lines
+    python -m utils.log_parser_bench 200000     # smaller run
+"""
+import re
+import sys
+import time
+import random
+
+from utils.log_parser_preprocess import get_log_normalizer
+
+
+#---------------- synthetic tracefmt log ---------------
+
+_EVENTS = [
+    "[{idx}]0004.{tid:04X}::{date}-{time}.{ms:03d} [Netwtw14]ROAM: candidate {ip} rssi=-{rssi} etwLength = {length}",
+    "[{idx}]0004.{tid:04X}::{date}-{time}.{ms:03d} [Netwtw14]ASSOC: state change {hex} -> {hex2} etwTimeStamp = {ts}",
+    "[{idx}]0004.{tid:04X}::{date}-{time}.{ms:03d} [Netwtw14]DISCONNECT reason={rssi} etwEvtDataAddress = {hex}   peer {ip}",
+    "[{idx}]0004.{tid:04X}::{date}-{time}.{ms:03d} [Netwtw14]FW: cmd 0x{rssi:02X} status {hex} etwLength = {hex3}",
+    "[{idx}]0004.{tid:04X}::{date}-{time}.{ms:03d} [Netwtw14]TX queue {rssi} depth={length}\tflags [7] ok",
+]
+
+def make_synthetic_log(n_lines: int, seed: int = 0):
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(n_lines):
+        template = _EVENTS[rnd.randrange(len(_EVENTS))]
+        lines.append(template.format(
+            idx=rnd.randrange(8),
+            tid=rnd.randrange(0x10000),
+            date=f"{rnd.randint(1, 12):02d}/{rnd.randint(1, 28):02d}/2025",
+            time=f"{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}",
+            ms=rnd.randrange(1000),
+            ip=f"{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}",
+            rssi=rnd.randrange(100),
+            length=rnd.randrange(4096),
+            ts=rnd.randrange(10**12),
+            hex=f"{rnd.randrange(16**8):08X}",
+            hex2=f"{rnd.randrange(16**12):012X}",
+            hex3=rnd.randrange(10**7, 10**9),
+        ) + "\n")
+    return lines
+
+
+#---------------- reference implementation ---------------
+
+def legacy_preprocess_line(line, preserve_timestamps=True):
+    """ the original eight-pass preprocess_log_for_llm body, kept for comparison """
+    if preserve_timestamps:
+        line = re.sub(r'(\d{2}/\d{2}/\d{4})-(\d{2}:\d{2}:\d{2})\.\d{3}', r'<TIME:\2>', line)
+    else:
+        line = re.sub(r'\d{2}/\d{2}/\d{4}-\d{2}:\d{2}:\d{2}\.\d{3}', '<TIMESTAMP>', line)
+    line = re.sub(r'\[(\d+)\]', '', line)
+    line = re.sub(r'etwTimeStamp\s*=\s*\d+', '', line)
+    line = re.sub(r'etwEvtDataAddress\s*=\s*[0-9A-F]+', '', line)
+    line = re.sub(r'\b[0-9A-F]{8,}\b', '<HEX_VALUE>', line)
+    line = re.sub(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b', '<IP_ADDR>', line)
+    line = re.sub(r'etwLength\s*=\s*\d+', '', line)
+    line = re.sub(r'\s+', ' ', line)
+    return line.strip()
+
+
+# lines where a deletion changes the word boundaries seen by a later rule,
+# the combined single-regex pass used to get these wrong
+EDGE_CASE_LINES = [
+    "x[1]ABCDEF12 y",
+    "a 1.2.3.4[5]6 b",
+    "DEADBEEF[1]x",
+    "ABCD[3]EF12 q",
+    "DEADBEEF01/02/2024-10:11:12.123 z",
+    "etwEvtDataAddress=FFetwTimeStamp=1AB",
+    "etwLength = 12345678 etwLength=1.2.3.4",
+    "[7]etwTimeStamp = 99 12.34.56.78 CAFEBABE",
+]
+
+def check_edge_cases():
+    for preserve_timestamps in (True, False):
+        normalize = get_log_normalizer(preserve_timestamps).normalize
+        for line in EDGE_CASE_LINES:
+            legacy, single_pass = legacy_preprocess_line(line, preserve_timestamps), normalize(line)
+            assert legacy == single_pass, f"{line!r}: legacy {legacy!r} != normalizer {single_pass!r}"
+    print(f"edge cases: {len(EDGE_CASE_LINES)} lines match legacy")
+
+
+#---------------- benchmarks ---------------
+
+def bench_normalizer(n_lines: int = 1_000_000):
+    check_edge_cases()
+    print(f"generating {n_lines} synthetic lines...")
+    lines = make_synthetic_log(n_lines)
+
+    for preserve_timestamps in (True, False):
+        start = time.perf_counter()
+        legacy = [legacy_preprocess_line(line, preserve_timestamps) for line in lines]
+        legacy_time = time.perf_counter() - start
+
+        normalize = get_log_normalizer(preserve_timestamps).normalize
+        start = time.perf_counter()
+        single_pass = [normalize(line) for line in lines]
+        single_pass_time = time.perf_counter() - start
+
+        mismatches = sum(1 for a, b in zip(legacy, single_pass) if a != b)
+        print(f"preserve_timestamps={preserve_timestamps}: "
+              f"legacy {legacy_time:.2f}s, single pass {single_pass_time:.2f}s "
+              f"(x{legacy_time / single_pass_time:.2f}), mismatches: {mismatches}")
+        assert mismatches == 0, "single pass normalizer output differs from legacy"
+
+
+if __name__ == "__main__":
+    bench_normalizer(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,97 @@
+"""
+Content-addressed cache of the log parser's intermediate artifacts
+(filtered.log, the grouped/mined summary and its stats), so re-running an
+analysis with only a different prompt goes straight to the LLM stage.
+"""
+import os
+import json
+import shutil
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# bump when filtering/grouping/mining changes in a way the key does not capture
+PIPELINE_VERSION = "1"
+
+FILTERED_LOG_NAME = "filtered.log"
+SUMMARY_LOG_NAME = "filtered_preprocessed.log"
+META_NAME = "meta.json"
+
+
+def hash_file(path: str, block_size: int = 4 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LogArtifactCache:
+
+    def __init__(self, cache_dir: str, max_entries: int = 20):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # (path, size, mtime) -> content hash, avoids re-hashing the same file in one session
+        self._file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+    def _content_hash(self, log_path: str) -> str:
+        stat = os.stat(log_path)
+        file_key = (os.path.abspath(log_path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._file_hashes.get(file_key)
+        if content_hash is None:
+            content_hash = self._file_hashes[file_key] = hash_file(log_path)
+        return content_hash
+
+    def make_key(self, log_path: str, *parts: str) -> str:
+        """ key from the log content plus anything that changes the output (filter digest, normalizer version, ...) """
+        digest = hashlib.sha256(PIPELINE_VERSION.encode("utf-8"))
+        digest.update(self._content_hash(log_path).encode("utf-8"))
+        for part in parts:
+            digest.update(b"\0" + str(part).encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def load(self, key: str, output_dir: str) -> Optional[Tuple[List[str], Dict[str, Any]]]:
+        """
+        On a hit, copy the cached files into output_dir and return (summary_lines, meta).
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry_dir, META_NAME), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            for name in (FILTERED_LOG_NAME, SUMMARY_LOG_NAME):
+                shutil.copyfile(os.path.join(entry_dir, name), os.path.join(output_dir, name))
+            with open(os.path.join(entry_dir, SUMMARY_LOG_NAME), "r", encoding="utf-8") as f:
+                summary_lines = f.read().splitlines()
+        except (OSError, ValueError):
+            return None
+
+        os.utime(entry_dir)  # keeps recently used entries out of eviction
+        print(f"log parser cache hit: {key}")
+        return summary_lines, meta
+
+    def store(self, key: str, output_dir: str, meta: Optional[Dict[str, Any]] = None):
+        entry_dir = os.path.join(self.cache_dir, key)
+        tmp_dir = f"{entry_dir}.tmp{threading.get_ident()}"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            for name in (FILTERED_LOG_NAME, SUMMARY_LOG_NAME):
+                shutil.copyfile(os.path.join(output_dir, name), os.path.join(tmp_dir, name))
+            with open(os.path.join(tmp_dir, META_NAME), "w", encoding="utf-8") as f:
+                json.dump(meta or {}, f, ensure_ascii=False, indent=2)
+            with self.lock:
+                if os.path.exists(entry_dir):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+                self._evict()
+        except OSError as e:
+            print(f"Failed to cache log parser artifacts: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _evict(self):
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if os.path.isdir(os.path.join(self.cache_dir, name)) and ".tmp" not in name]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for entry_dir in entries[self.max_entries:]:
+            shutil.rmtree(entry_dir, ignore_errors=True)
@@ -1,103 +1,513 @@
+import hashlib
+import heapq
+import os
 import re
-from collections import defaultdict
-from typing import List
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+from utils import helpers
 
 
 #---------------- log filter ---------------
 
-def extract_enabled_keywords_from_filter_file(filter_file_path: str) -> List[str]:
+@dataclass(frozen=True)
+class TatFilter:
+    """ one <filter> entry of a TextAnalysisTool.NET .tat file """
+    text: str
+    enabled: bool = True
+    excluding: bool = False
+    case_sensitive: bool = False
+    regex: bool = False
+
+_TAT_LINE_PATTERN = re.compile(r'enabled="y".*?text="(.*?)"', re.IGNORECASE)
+
+def parse_tat_filters(filter_file_path: str) -> List[TatFilter]:
     """
-    Extracts all `text` attributes from filter lines where `enabled="y"`.
+    Parses every <filter> of a .tat file with its enabled/excluding/case/regex flags.
+    Marker filters have no text and are skipped. Files that are not valid XML
+    fall back to the old line scan (enabled="y" ... text="...") as plain includes.
     """
-    enabled_keywords = []
-    pattern = re.compile(r'enabled="y".*?text="(.*?)"', re.IGNORECASE)
+    def flag(element, name):
+        return element.get(name, "n").strip().lower() in ("y", "yes", "true", "1")
+
+    try:
+        root = ElementTree.parse(filter_file_path).getroot()
+    except ElementTree.ParseError as e:
+        print(f"Invalid .tat xml {filter_file_path}: {e}, falling back to line scan")
+        with open(filter_file_path, "r", encoding="utf-8") as f:
+            return [TatFilter(text=match.group(1).strip())
+                    for match in map(_TAT_LINE_PATTERN.search, f) if match]
+
+    filters = []
+    for element in root.iter("filter"):
+        if element.get("type", "matches_text") != "matches_text" or element.get("text") is None:
+            continue
+        filters.append(TatFilter(
+            text=element.get("text"),
+            enabled=flag(element, "enabled"),
+            excluding=flag(element, "excluding"),
+            case_sensitive=flag(element, "case_sensitive"),
+            regex=flag(element, "regex"),
+        ))
+    return filters
 
-    with open(filter_file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            match = pattern.search(line)
-            if match:
-                keyword = match.group(1).strip()
-                enabled_keywords.append(keyword)
+def extract_enabled_keywords_from_filter_file(filter_file_path: str) -> List[str]:
+    """
+    Extracts all `text` attributes of enabled including filters.
+    """
+    enabled_keywords = [f.text for f in parse_tat_filters(filter_file_path) if f.enabled and not f.excluding]
     print("enabled_keyword", enabled_keywords)
     return enabled_keywords
 
-def filter_log_by_keywords(log_lines: List[str], keywords: List[str]) -> List[str]:
+class KeywordMatcher:
     """
-    Filters log lines based on enabled keywords and removes the first character (e.g., line number or symbol).
+    Case-insensitive multi-keyword matcher compiled once per filter.
+    All keywords are folded into a single alternation regex so each line is
+    scanned in one pass; the per-keyword check only runs on lines that hit.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        # keep order, drop duplicates (case-insensitive)
+        seen = set()
+        self.keywords: List[str] = []
+        for k in keywords:
+            folded = k.lower()
+            if folded not in seen:
+                seen.add(folded)
+                self.keywords.append(k)
+        self._lowered = [k.lower() for k in self.keywords]
+        # an empty text="" filter matches every line, same as a plain `in` check
+        self._match_all = "" in self._lowered
+
+        # longest first so the alternation prefers the most specific keyword
+        alternation = "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True) if k)
+        self._regex = re.compile(alternation, re.IGNORECASE) if alternation else None
+
+        # raw-bytes prefilter for the mmap reader; bytes IGNORECASE only folds ASCII,
+        # so non-ASCII keywords (or match-all) fall back to checking every line
+        self.bytes_regex = None
+        if alternation and not self._match_all and alternation.isascii():
+            self.bytes_regex = re.compile(alternation.encode("ascii"), re.IGNORECASE)
+
+    def search(self, line: str) -> bool:
+        if self._match_all:
+            return True
+        return self._regex is not None and self._regex.search(line) is not None
+
+    def matches(self, line: str) -> List[str]:
+        """ return every keyword found in line (in filter order) """
+        if not self.search(line):
+            return []
+        lowered = line.lower()
+        return [k for k, lk in zip(self.keywords, self._lowered) if lk in lowered]
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+
+@lru_cache(maxsize=32)
+def _build_keyword_matcher(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+def build_keyword_matcher(keywords: Iterable[str]) -> KeywordMatcher:
+    """ cached so the same .tat keyword set is only compiled once """
+    return _build_keyword_matcher(tuple(keywords))
+
+class _FilterSet:
+    """ the include or exclude half of a FilterProgram """
+
+    def __init__(self, filters: List[TatFilter]):
+        self.filters = filters
+        # plain case-insensitive texts share one KeywordMatcher, everything else gets its own pattern
+        self.keywords = build_keyword_matcher(f.text for f in filters if not f.regex and not f.case_sensitive)
+        self.patterns = []
+        for f in filters:
+            if not f.regex and not f.case_sensitive:
+                continue
+            try:
+                pattern = f.text if f.regex else re.escape(f.text)
+                self.patterns.append(re.compile(pattern, 0 if f.case_sensitive else re.IGNORECASE))
+            except re.error as e:
+                print(f"Skipping invalid filter regex {f.text!r}: {e}")
+
+    def search(self, line: str) -> bool:
+        if self.keywords.search(line):
+            return True
+        return any(pattern.search(line) for pattern in self.patterns)
+
+    def __bool__(self):
+        return bool(self.keywords) or bool(self.patterns)
+
+class FilterProgram:
     """
-    filtered = []
+    Executable form of a .tat file, with TextAnalysisTool semantics:
+    a line is kept when it hits an enabled including filter and no enabled
+    excluding filter; with no including filters every non-excluded line is kept.
+    Exposes the same search()/bytes_regex interface as KeywordMatcher.
+    """
+
+    def __init__(self, filters: Iterable[TatFilter]):
+        self.filters = [f for f in filters if f.enabled]
+        self._include = _FilterSet([f for f in self.filters if not f.excluding])
+        self._exclude = _FilterSet([f for f in self.filters if f.excluding])
+
+        # raw-bytes prefilter, only when every include is a plain ASCII text
+        # (case-sensitive texts are still fine: the decoded line is rechecked)
+        self.bytes_regex = None
+        includes = self._include.filters
+        if includes and all(f.text and not f.regex for f in includes):
+            alternation = "|".join(re.escape(f.text) for f in includes)
+            if alternation.isascii():
+                self.bytes_regex = re.compile(alternation.encode("ascii"), re.IGNORECASE)
+
+    def search(self, line: str) -> bool:
+        if self._include and not self._include.search(line):
+            return False
+        return not (self._exclude and self._exclude.search(line))
+
+    def matches(self, line: str) -> List[str]:
+        """ return the text of every including filter that keeps this line """
+        if not self.search(line):
+            return []
+        hits = []
+        for f in self._include.filters:
+            flags = 0 if f.case_sensitive else re.IGNORECASE
+            if re.search(f.text if f.regex else re.escape(f.text), line, flags):
+                hits.append(f.text)
+        return hits
+
+    def __bool__(self):
+        return bool(self.filters)
+
+    @property
+    def digest(self) -> str:
+        """ stable hash of the enabled filters, for caching filter output """
+        return hashlib.sha1(repr(self.filters).encode("utf-8")).hexdigest()
+
+_filter_program_cache = {}
+_filter_program_lock = threading.Lock()
+
+def load_filter_program(filter_file_path: str) -> FilterProgram:
+    """
+    Compiled FilterProgram for a .tat file, cached by path and invalidated
+    when the file's mtime or size changes.
+    """
+    stat = os.stat(filter_file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _filter_program_lock:
+        cached = _filter_program_cache.get(filter_file_path)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    filters = parse_tat_filters(filter_file_path)
+    program = FilterProgram(filters)
+    print(f"compiled filter {os.path.basename(filter_file_path)}: "
+          f"{len(program.filters)} enabled of {len(filters)} filters")
+    with _filter_program_lock:
+        _filter_program_cache[filter_file_path] = (version, program)
+    return program
+
+LineMatcher = Union[KeywordMatcher, FilterProgram]
+
+_LINE_NUMBER_PREFIX = re.compile(r"^\d+\t")
+
+def iter_filter_log_by_keywords(log_lines: Iterable[str], keywords: Union[List[str], LineMatcher]) -> Iterator[str]:
+    """
+    Streaming version of filter_log_by_keywords: yields matching lines one at a time.
+    `keywords` can be a keyword list, a KeywordMatcher or a FilterProgram.
+    """
+    matcher = keywords if isinstance(keywords, (KeywordMatcher, FilterProgram)) else build_keyword_matcher(keywords)
 
     for line in log_lines:
-        if any(k.lower() in line.lower() for k in keywords):
-            cleaned_line = re.sub(r"^\d+\t", "", line)  # Remove first line number and leading whitespace
-            filtered.append(cleaned_line)
+        if matcher.search(line):
+            yield _LINE_NUMBER_PREFIX.sub("", line)  # Remove first line number and leading whitespace
 
-    return filtered
+def filter_log_by_keywords(log_lines: Iterable[str], keywords: Union[List[str], LineMatcher]) -> List[str]:
+    """
+    Filters log lines based on enabled keywords and removes the first character (e.g., line number or symbol).
+    """
+    return list(iter_filter_log_by_keywords(log_lines, keywords))
 
 #---------------- preprocess filtered log ---------------
 
-def preprocess_log_for_llm(log_lines, preserve_timestamps=True):
-    processed_lines = []
-    
+@dataclass(frozen=True)
+class NormalizeRule:
+    """
+    One mask applied by LogNormalizer. `replacement` follows re.sub syntax and
+    may reference numbered groups of its own `pattern` (\\2 or \\g<2>).
+    `first_chars` is an optional regex character class body listing every
+    character a match can start with; when all rules of a stage set it, the
+    normalizer skips positions that cannot start any match.
+    `stage` orders the passes (extra rules default to after the built-in ones): rules sharing a stage run as one combined regex,
+    so only put rules there whose matches cannot create, break or overlap each
+    other (a deletion changes the \\b boundaries the next rule sees).
+    `literal` is an optional substring every match contains; a stage whose rules
+    all set it is skipped for lines that contain none of them.
+    """
+    name: str
+    pattern: str
+    replacement: str = ""
+    first_chars: Optional[str] = None
+    stage: int = 9  # after the built-in stages unless set
+    literal: Optional[str] = None
+
+TIMESTAMP_RULE = NormalizeRule("timestamp", r'(\d{2}/\d{2}/\d{4})-(\d{2}:\d{2}:\d{2})\.\d{3}', r'<TIME:\2>', r'\d',
+                               stage=0, literal='/')
+TIMESTAMP_MASK_RULE = NormalizeRule("timestamp", r'\d{2}/\d{2}/\d{4}-\d{2}:\d{2}:\d{2}\.\d{3}', '<TIMESTAMP>', r'\d',
+                                    stage=0, literal='/')
+
+# same order as the original eight re.sub passes; within a stage the order is
+# priority when two rules could start at the same position
+DEFAULT_NORMALIZE_RULES = (
+    NormalizeRule("line_index", r'\[(\d+)\]', '', r'\[', stage=1, literal='['),
+    NormalizeRule("etw_timestamp", r'etwTimeStamp\s*=\s*\d+', '', 'e', stage=2, literal='etwTimeStamp'),
+    NormalizeRule("etw_data_address", r'etwEvtDataAddress\s*=\s*[0-9A-F]+', '', 'e', stage=3,
+                  literal='etwEvtDataAddress'),
+    # hex tokens are whole words of 8+ chars and IP octets whole words of 1-3 digits, so they never overlap
+    NormalizeRule("hex", r'\b[0-9A-F]{8,}\b', '<HEX_VALUE>', '0-9A-F', stage=4),
+    NormalizeRule("ip", r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b', '<IP_ADDR>', r'\d', stage=4, literal='.'),
+    NormalizeRule("etw_length", r'etwLength\s*=\s*\d+', '', 'e', stage=5, literal='etwLength'),
+)
+
+_GROUP_REF = re.compile(r'\\(?:g<(\d+)>|(\d+))')
+
+class _NormalizeStage:
+    """ rules of one stage folded into a single regex """
+
+    def __init__(self, rules: Tuple[NormalizeRule, ...]):
+        self.rules = rules
+        pattern = "|".join(f"(?P<r{idx}>{rule.pattern})" for idx, rule in enumerate(rules))
+        if all(rule.first_chars for rule in rules):
+            first_chars = "".join(rule.first_chars for rule in rules)
+            pattern = f"(?=[{first_chars}])(?:{pattern})"
+        self._regex = re.compile(pattern)
+        self.literals = tuple(rule.literal for rule in rules) if all(rule.literal for rule in rules) else None
+
+        # group refs are relative to each rule's pattern; shift them to the combined pattern once here
+        self._replacements = []
+        for idx, rule in enumerate(rules):
+            offset = self._regex.groupindex[f"r{idx}"]
+            parts = _GROUP_REF.split(rule.replacement)
+            if len(parts) == 1:
+                self._replacements.append(rule.replacement)
+                continue
+            template = []
+            for pos in range(0, len(parts), 3):
+                template.append(parts[pos])
+                if pos + 1 < len(parts):
+                    template.append(offset + int(parts[pos + 1] or parts[pos + 2]))
+            self._replacements.append(tuple(template))
+
+    def _replace(self, match) -> str:
+        replacement = self._replacements[int(match.lastgroup[1:])]
+        if isinstance(replacement, str):
+            return replacement
+        return "".join(part if isinstance(part, str) else (match.group(part) or "") for part in replacement)
+
+    def apply(self, line: str) -> str:
+        if self.literals is not None and not any(literal in line for literal in self.literals):
+            return line
+        return self._regex.sub(self._replace, line)
+
+class LogNormalizer:
+    """
+    Applies a table of NormalizeRule masks, one combined regex pass per stage,
+    then collapses whitespace. Built once and reused; add masks (MAC, GUID, ...)
+    by passing extra rules instead of adding another re.sub pass.
+    """
+
+    def __init__(self, rules: Iterable[NormalizeRule]):
+        self.rules: Tuple[NormalizeRule, ...] = tuple(rules)
+        stages = {}
+        for rule in self.rules:
+            stages.setdefault(rule.stage, []).append(rule)
+        self._stages = [_NormalizeStage(tuple(stages[stage])) for stage in sorted(stages)]
+
+    @property
+    def version(self) -> str:
+        """ changes whenever the rule table does, for caching normalized output """
+        return hashlib.sha1(repr(self.rules).encode("utf-8")).hexdigest()
+
+    def with_rules(self, *extra_rules: NormalizeRule) -> "LogNormalizer":
+        return LogNormalizer(self.rules + extra_rules)
+
+    def normalize(self, line: str) -> str:
+        for stage in self._stages:
+            line = stage.apply(line)
+        return " ".join(line.split())
+
+@lru_cache(maxsize=2)
+def get_log_normalizer(preserve_timestamps=True) -> LogNormalizer:
+    timestamp_rule = TIMESTAMP_RULE if preserve_timestamps else TIMESTAMP_MASK_RULE
+    return LogNormalizer((timestamp_rule,) + DEFAULT_NORMALIZE_RULES)
+
+def iter_preprocess_log_for_llm(log_lines: Iterable[str], preserve_timestamps=True,
+                                normalizer: Optional[LogNormalizer] = None) -> Iterator[str]:
+    normalize = (normalizer or get_log_normalizer(preserve_timestamps)).normalize
     for line in log_lines:
         if not line.strip():
             continue
-            
-        # 1. timestamp
-        if preserve_timestamps:
-            line = re.sub(r'(\d{2}/\d{2}/\d{4})-(\d{2}:\d{2}:\d{2})\.\d{3}', r'<TIME:\2>', line)
-        else:
-            line = re.sub(r'\d{2}/\d{2}/\d{4}-\d{2}:\d{2}:\d{2}\.\d{3}', '<TIMESTAMP>', line)
-        
-        # 2. unify 
-        line = re.sub(r'\[(\d+)\]', '', line)
-        
-        # ETW
-        line = re.sub(r'etwTimeStamp\s*=\s*\d+', '', line)
-        
-        # addr
-        line = re.sub(r'etwEvtDataAddress\s*=\s*[0-9A-F]+', '', line)
-        
-        # hex
-        line = re.sub(r'\b[0-9A-F]{8,}\b', '<HEX_VALUE>', line)
-        
-        # IP
-        line = re.sub(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b', '<IP_ADDR>', line)
-        
-        # arg
-        line = re.sub(r'etwLength\s*=\s*\d+', '', line)
-        
-        # 3. space remove
-        line = re.sub(r'\s+', ' ', line)
-        
-        processed_lines.append(line.strip())
-    
-    return processed_lines
+        yield normalize(line)
 
-def group_similar_logs(processed_lines):
+def preprocess_log_for_llm(log_lines, preserve_timestamps=True, normalizer: Optional[LogNormalizer] = None):
+    return list(iter_preprocess_log_for_llm(log_lines, preserve_timestamps, normalizer))
 
-    grouped_logs = defaultdict(list)
-    
-    for line in processed_lines:
-        pattern = re.sub(r'\[TIME:[^\]]+\]', '[TIME:*]', line)
-        grouped_logs[pattern].append(line)
-    
-    result = []
-    for pattern, lines in grouped_logs.items():
-        if len(lines) == 1:
-            result.append(lines[0])
-        elif len(lines) <= 2:
-            result.extend(lines)
+# preprocess_log_for_llm emits <TIME:hh:mm:ss>
+TIME_TOKEN = re.compile(r'<TIME:([^>]+)>')
+
+class LogGroups:
+    """
+    Running state for group_similar_logs. Only the first/last line, a count and
+    their sequence numbers are kept per pattern, so memory grows with the
+    number of distinct patterns instead of with the log size. Past max_groups
+    patterns the least recently seen tenth is dropped (counted in
+    evicted_lines), which bounds memory on logs where few lines repeat.
+    """
+    MAX_GROUPS = 100_000
+
+    def __init__(self, max_groups: Optional[int] = None):
+        # pattern -> [first_line, last_line, count, first_seq, last_seq]; dict keeps first-seen order
+        self.groups = {}
+        self.total = 0
+        self.max_groups = max_groups or self.MAX_GROUPS
+        self.evicted_lines = 0
+
+    def add(self, line: str):
+        pattern = TIME_TOKEN.sub('<TIME:*>', line)
+        group = self.groups.get(pattern)
+        if group is None:
+            self.groups[pattern] = [line, line, 1, self.total, self.total]
+            if len(self.groups) > self.max_groups:
+                self._evict()
         else:
-            first_time = re.search(r'\[TIME:([^\]]+)\]', lines[0])
-            last_time = re.search(r'\[TIME:([^\]]+)\]', lines[-1])
-            
-            result.append(lines[0])
-            if first_time and last_time:
-                result.append(f"... (repeated {len(lines)-2} times between {first_time.group(1)} and {last_time.group(1)}) ...")
+            group[1] = line
+            group[2] += 1
+            group[4] = self.total
+        self.total += 1
+
+    def _evict(self):
+        """ drop the groups seen least recently, down to 90% of max_groups """
+        excess = len(self.groups) - int(self.max_groups * 0.9)
+        if excess <= 0:
+            return
+        for pattern in heapq.nsmallest(excess, self.groups, key=lambda p: self.groups[p][4]):
+            self.evicted_lines += self.groups.pop(pattern)[2]
+
+    def update(self, lines: Iterable[str]) -> "LogGroups":
+        for line in lines:
+            self.add(line)
+        return self
+
+    def merge(self, other: "LogGroups") -> "LogGroups":
+        """ fold in groups of a later part of the same log """
+        for pattern, (first, last, count, first_seq, last_seq) in other.groups.items():
+            group = self.groups.get(pattern)
+            if group is None:
+                self.groups[pattern] = [first, last, count, self.total + first_seq, self.total + last_seq]
             else:
-                result.append(f"... (repeated {len(lines)-2} times) ...")
-            result.append(lines[-1])
-    
-    return result
+                group[1] = last
+                group[2] += count
+                group[4] = self.total + last_seq
+        self.total += other.total
+        self.evicted_lines += other.evicted_lines
+        if len(self.groups) > self.max_groups:
+            self._evict()
+        return self
+
+    def to_lines(self) -> List[str]:
+        result = []
+        for first, last, count, _, _ in self.groups.values():
+            if count == 1:
+                result.append(first)
+            elif count <= 2:
+                result.extend([first, last])
+            else:
+                first_time = TIME_TOKEN.search(first)
+                last_time = TIME_TOKEN.search(last)
+                
+                result.append(first)
+                if first_time and last_time:
+                    result.append(f"... (repeated {count-2} times between {first_time.group(1)} and {last_time.group(1)}) ...")
+                else:
+                    result.append(f"... (repeated {count-2} times) ...")
+                result.append(last)
+        if self.evicted_lines:
+            result.append(f"... ({self.evicted_lines} lines of rare patterns dropped) ...")
+        return result
+
+def group_similar_logs(processed_lines):
+    return LogGroups().update(processed_lines).to_lines()
+
+
+#---------------- parallel chunked filtering ---------------
+
+def split_log_ranges(path: str, n_chunks: int) -> List[Tuple[int, int]]:
+    """
+    Split a log file into at most n_chunks (start, end) byte ranges.
+    Every range starts at the beginning of a line.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    step = max(1, size // max(1, n_chunks))
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, n_chunks):
+            pos = max(i * step, bounds[-1] + 1)
+            if pos >= size:
+                break
+            # readline from one byte back lands on the first line start >= pos
+            f.seek(pos - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def filter_log_range(path: str, start: int, end: int, matcher: LineMatcher, part_path: str,
+                     preserve_timestamps=True) -> LogGroups:
+    """
+    Process pool worker: filter one byte range into part_path and return its groups.
+    """
+    normalize = get_log_normalizer(preserve_timestamps).normalize
+    groups = LogGroups()
+    with open(part_path, "w", encoding="utf-8") as out:
+        log_lines = helpers.iter_log_file_mmap(path, matcher.bytes_regex, start, end)
+        for line in iter_filter_log_by_keywords(log_lines, matcher):
+            out.write(line if line.endswith("\n") else line + "\n")
+            if line.strip():
+                groups.add(normalize(line))
+    return groups
+
+def parallel_filter_and_group(log_path: str, matcher: LineMatcher, filtered_path: str,
+                              workers: Optional[int] = None, preserve_timestamps=True) -> LogGroups:
+    """
+    Filter and normalize byte ranges of log_path in a process pool.
+    Part files are concatenated into filtered_path in file order and the groups are merged.
+    """
+    workers = workers or os.cpu_count() or 1
+    # a few ranges per worker keeps the pool busy when some ranges are denser than others
+    ranges = split_log_ranges(log_path, workers * 4)
+    part_paths = [f"{filtered_path}.part{idx}" for idx in range(len(ranges))]
+
+    groups = LogGroups()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(filter_log_range, log_path, start, end, matcher, part_path, preserve_timestamps)
+                   for (start, end), part_path in zip(ranges, part_paths)]
 
+        with open(filtered_path, "wb") as out:
+            for future, part_path in zip(futures, part_paths):
+                groups.merge(future.result())
+                with open(part_path, "rb") as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(part_path)
+    print(f"save to: {filtered_path}")
+    return groups
@@ -0,0 +1,195 @@
+"""
+Online log template mining for the log parser (Drain-style).
+
+Normalized lines are routed through a fixed-depth parse tree
+(token count -> first tokens -> leaf) and merged into the most similar
+template of their leaf; differing tokens become <*> parameters.
+Cluster count and tree fan-out are capped, so memory stays bounded.
+"""
+import re
+import json
+import hashlib
+import inspect
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from utils.log_parser_preprocess import LogGroups, TIME_TOKEN
+
+
+PARAM = "<*>"
+_HAS_DIGIT = re.compile(r"\d")
+
+
+@dataclass
+class LogCluster:
+    id: int
+    tokens: List[str]
+    count: int = 0
+    first_time: Optional[str] = None
+    last_time: Optional[str] = None
+    first_line: str = ""
+    first_seq: int = 0
+    last_seq: int = 0
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+    @property
+    def parameter_positions(self) -> List[int]:
+        return [idx for idx, token in enumerate(self.tokens) if token == PARAM]
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "template": self.template,
+            "parameter_positions": self.parameter_positions,
+            "count": self.count,
+            "first_time": self.first_time,
+            "last_time": self.last_time,
+        }
+
+
+@dataclass
+class _Node:
+    children: Dict[str, "_Node"] = field(default_factory=dict)
+    cluster_ids: List[int] = field(default_factory=list)
+
+
+class LogTemplateMiner:
+
+    def __init__(self, depth: int = 4, sim_threshold: float = 0.5,
+                 max_children: int = 100, max_clusters: int = 5000):
+        self.depth = max(depth, 3)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+
+        self.root = _Node()
+        # cluster id -> cluster, most recently hit last (LRU eviction)
+        self.clusters: "OrderedDict[int, LogCluster]" = OrderedDict()
+        self.next_id = 1
+        self.total = 0
+        self.evicted_lines = 0
+
+    #---------------- tree ---------------
+
+    def _leaf(self, tokens: List[str]) -> _Node:
+        node = self.root.children.setdefault(str(len(tokens)), _Node())
+        for token in tokens[:self.depth - 2]:
+            key = PARAM if _HAS_DIGIT.search(token) else token
+            if key not in node.children and len(node.children) >= self.max_children:
+                # full node: everything new shares the wildcard branch
+                key = PARAM
+            node = node.children.setdefault(key, _Node())
+        return node
+
+    @staticmethod
+    def _similarity(template: List[str], tokens: List[str]):
+        same = params = 0
+        for t1, t2 in zip(template, tokens):
+            if t1 == PARAM:
+                params += 1
+            elif t1 == t2:
+                same += 1
+        return same / len(tokens) if tokens else 1.0, params
+
+    def _best_cluster(self, leaf: _Node, tokens: List[str]) -> Optional[LogCluster]:
+        best, best_key = None, (-1.0, -1)
+        for cluster_id in leaf.cluster_ids:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is None:
+                continue
+            key = self._similarity(cluster.tokens, tokens)
+            if key > best_key:
+                best, best_key = cluster, key
+        if best is not None and best_key[0] >= self.sim_threshold:
+            return best
+        return None
+
+    def _evict(self):
+        while len(self.clusters) > self.max_clusters:
+            _, cluster = self.clusters.popitem(last=False)
+            self.evicted_lines += cluster.count
+
+    #---------------- mining ---------------
+
+    def add(self, line: str, count: int = 1, last_line: Optional[str] = None,
+            seq: Optional[int] = None, last_seq: Optional[int] = None) -> LogCluster:
+        """
+        Add one normalized line, or a run of `count` identical lines
+        (first `line` .. `last_line`) as produced by LogGroups.
+        """
+        seq = self.total if seq is None else seq
+        last_seq = seq + count - 1 if last_seq is None else last_seq
+        first_time = TIME_TOKEN.search(line)
+        last_time = TIME_TOKEN.search(last_line) if last_line else first_time
+        tokens = TIME_TOKEN.sub("", line).split()
+
+        leaf = self._leaf(tokens)
+        cluster = self._best_cluster(leaf, tokens)
+        if cluster is None:
+            cluster = LogCluster(id=self.next_id, tokens=list(tokens), first_line=line, first_seq=seq,
+                                 first_time=first_time.group(1) if first_time else None)
+            self.next_id += 1
+            self.clusters[cluster.id] = cluster
+            leaf.cluster_ids = [cid for cid in leaf.cluster_ids if cid in self.clusters] + [cluster.id]
+            self._evict()
+        else:
+            cluster.tokens = [t1 if t1 == t2 else PARAM for t1, t2 in zip(cluster.tokens, tokens)]
+            self.clusters.move_to_end(cluster.id)
+            if seq < cluster.first_seq:
+                cluster.first_seq, cluster.first_line = seq, line
+                cluster.first_time = first_time.group(1) if first_time else cluster.first_time
+
+        cluster.count += count
+        if last_seq >= cluster.last_seq:
+            cluster.last_seq = last_seq
+            cluster.last_time = last_time.group(1) if last_time else cluster.last_time
+        self.total = max(self.total, last_seq + 1)
+        return cluster
+
+    def update(self, lines: Iterable[str]) -> "LogTemplateMiner":
+        for line in lines:
+            self.add(line)
+        return self
+
+    def add_groups(self, groups: LogGroups) -> "LogTemplateMiner":
+        """ mine the exact-duplicate groups of a LogGroups instead of every line """
+        for first, last, count, first_seq, last_seq in groups.groups.values():
+            self.add(first, count, last, seq=first_seq, last_seq=last_seq)
+        self.evicted_lines += groups.evicted_lines
+        return self
+
+    #---------------- output ---------------
+
+    def sorted_clusters(self) -> List[LogCluster]:
+        return sorted(self.clusters.values(), key=lambda c: c.first_seq)
+
+    def to_lines(self) -> List[str]:
+        """
+        Dense summary in order of first appearance: single lines are kept as-is,
+        repeated templates become `[T<id> x<count> <first>~<last>] template`.
+        """
+        result = []
+        for cluster in self.sorted_clusters():
+            if cluster.count == 1:
+                result.append(cluster.first_line)
+                continue
+            span = f" {cluster.first_time}~{cluster.last_time}" if cluster.first_time else ""
+            result.append(f"[T{cluster.id} x{cluster.count}{span}] {cluster.template}")
+        if self.evicted_lines:
+            result.append(f"... ({self.evicted_lines} lines of rare templates dropped) ...")
+        return result
+
+
+def mine_log_templates(groups: LogGroups, **miner_args) -> List[str]:
+    return LogTemplateMiner(**miner_args).add_groups(groups).to_lines()
+
+def template_miner_digest(**miner_args) -> str:
+    """ hash of the effective miner settings and the group cap in front of it, for cache keys """
+    params = inspect.signature(LogTemplateMiner.__init__).parameters
+    config = {name: miner_args.get(name, param.default) for name, param in params.items() if name != "self"}
+    config["max_groups"] = LogGroups.MAX_GROUPS
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
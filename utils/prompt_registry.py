@@ -0,0 +1,137 @@
+"""
+In-memory index of the prompt .py files (log parser prompt/ and custom_prompt/,
+description prompts) with their SYS_PROMPT strings.
+
+Prompts live on a network share, so every listdir/open/exec is a round trip.
+Each file is stat'ed at most once every `check_interval` seconds. It is only
+re-read (first line) or re-executed (SYS_PROMPT) when its mtime or size
+changed. Writers call invalidate() so their own edits show up at once.
+"""
+import os
+import time
+import threading
+import importlib.util
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class PromptEntry:
+    path: str
+    signature: Tuple[int, int]          # (mtime_ns, size) the cached values belong to
+    checked: float = 0.0                # monotonic time of the last stat
+    is_prompt: Optional[bool] = None    # first line is a SYS_PROMPT assignment
+    sys_prompt: Optional[str] = None
+
+
+@dataclass
+class PromptDir:
+    signature: Tuple[int, int]
+    checked: float
+    files: List[str]
+
+
+def _signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def _is_prompt_file(path: str) -> bool:
+    with open(path, 'r', encoding='utf-8') as f:
+        first_line = f.readline(80).strip()
+    return bool(first_line) and first_line.startswith('SYS_PROMPT') and '=' in first_line
+
+def _load_sys_prompt(path: str) -> str:
+    spec = importlib.util.spec_from_file_location("prompt_module", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SYS_PROMPT
+
+
+class PromptRegistry:
+
+    def __init__(self, check_interval: float = 5.0, max_workers: int = 10):
+        self.check_interval = check_interval
+        self.max_workers = max_workers
+        self.entries: Dict[str, PromptEntry] = {}
+        self.dirs: Dict[str, PromptDir] = {}
+        self.lock = threading.Lock()
+
+    def _entry(self, path: str, force: bool = False) -> PromptEntry:
+        """ entry for path, with cached values dropped if the file changed since they were read """
+        path = os.path.abspath(path)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry is not None and not force and now - entry.checked < self.check_interval:
+            return entry
+
+        signature = _signature(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or entry.signature != signature:
+                entry = self.entries[path] = PromptEntry(path, signature)
+            entry.checked = now
+        return entry
+
+    def _dir_files(self, prompt_dir: str) -> List[str]:
+        prompt_dir = os.path.abspath(prompt_dir)
+        now = time.monotonic()
+        with self.lock:
+            cached = self.dirs.get(prompt_dir)
+        if cached is not None and now - cached.checked < self.check_interval:
+            return cached.files
+
+        signature = _signature(prompt_dir)
+        if cached is not None and cached.signature == signature:
+            files = cached.files
+        else:
+            files = sorted(f for f in os.listdir(prompt_dir) if f.endswith('.py'))
+        with self.lock:
+            self.dirs[prompt_dir] = PromptDir(signature, now, files)
+        return files
+
+    def _check_prompt_file(self, path: str) -> bool:
+        entry = self._entry(path)
+        if entry.is_prompt is None:
+            entry.is_prompt = _is_prompt_file(path)
+        return entry.is_prompt
+
+    def list_prompts(self, prompt_dir: str) -> List[str]:
+        """ .py files in prompt_dir whose first line assigns SYS_PROMPT """
+        if not os.path.exists(prompt_dir):
+            return []
+        files = self._dir_files(prompt_dir)
+
+        def check(filename):
+            try:
+                return self._check_prompt_file(os.path.join(prompt_dir, filename))
+            except Exception as e:
+                print(f"Error reading {os.path.join(prompt_dir, filename)}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            valid = list(executor.map(check, files))
+        return [filename for filename, ok in zip(files, valid) if ok]
+
+    def get_sys_prompt(self, path: str) -> str:
+        """ SYS_PROMPT of the prompt module at path; raises like importing it would """
+        entry = self._entry(path)
+        if entry.sys_prompt is None:
+            entry.sys_prompt = _load_sys_prompt(path)
+        return entry.sys_prompt
+
+    def invalidate(self, path: Optional[str] = None):
+        """ forget path (a prompt file, or its directory listing too), or everything """
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                self.dirs.clear()
+                return
+            path = os.path.abspath(path)
+            self.entries.pop(path, None)
+            self.dirs.pop(path, None)
+            self.dirs.pop(os.path.dirname(path), None)
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,47 @@
+"""
+Forwards streamed LLM tokens to the browser over Socket.IO.
+"""
+import time
+import threading
+
+
+class SocketTokenStream:
+    """
+    Callable on_token sink for LLM_helper: buffers deltas and emits them as
+    {'delta': text} on `event`, at most once every `interval` seconds so a fast
+    stream does not turn into one socket message per token. Call flush() when
+    the completion is done.
+    """
+
+    def __init__(self, socketio, event, namespace='/progress', interval=0.1, **emit_kwargs):
+        self.socketio = socketio
+        self.event = event
+        self.namespace = namespace
+        self.interval = interval
+        self.emit_kwargs = emit_kwargs
+        self.buffer = []
+        self.last_emit = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, delta: str):
+        with self.lock:
+            self.buffer.append(delta)
+            if time.monotonic() - self.last_emit < self.interval:
+                return
+            text = self._take()
+        self._emit(text)
+
+    def flush(self):
+        with self.lock:
+            text = self._take()
+        if text:
+            self._emit(text)
+
+    def _take(self) -> str:
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.last_emit = time.monotonic()
+        return text
+
+    def _emit(self, text: str):
+        self.socketio.emit(self.event, {'delta': text}, namespace=self.namespace, **self.emit_kwargs)
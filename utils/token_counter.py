@@ -0,0 +1,40 @@
+from functools import lru_cache
+from typing import Iterable
+
+try:
+    import tiktoken
+except ImportError:  # optional, fall back to a character estimate
+    tiktoken = None
+
+
+# rough chars-per-token for English/log text when tiktoken is unavailable
+_CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    for get in (lambda: tiktoken.encoding_for_model(model),
+                lambda: tiktoken.get_encoding("o200k_base"),
+                lambda: tiktoken.get_encoding("cl100k_base")):
+        try:
+            return get()
+        except Exception:
+            # unknown model name, or the BPE file could not be fetched through the proxy
+            continue
+    print("tiktoken encoding unavailable, estimating tokens from length")
+    return None
+
+def count_tokens(text: str, model: str = "gpt-4.1") -> int:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_tokens_per_line(lines: Iterable[str], model: str = "gpt-4.1"):
+    """ token count of each line, +1 for the joining newline """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return [(len(line) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN + 1 for line in lines]
+    lines = list(lines)
+    return [len(tokens) + 1 for tokens in encoding.encode_batch(lines, disallowed_special=())]